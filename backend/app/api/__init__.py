@@ -2,5 +2,7 @@ from .auth import router as auth
 from .chat import router as chat
 from .documents import router as documents
 from .users import router as users
+from .sync import router as sync
+from .admin import router as admin
 
-__all__ = ["auth", "chat", "documents", "users"] 
\ No newline at end of file
+__all__ = ["auth", "chat", "documents", "users", "sync", "admin"] 
\ No newline at end of file
@@ -0,0 +1,99 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date, datetime, timedelta
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.profiling import recent_profiles, get_profile, query_budget
+from app.models.user import User
+from app.models.usage import UsageDaily, RollupWatermark
+from app.api.auth import get_current_user
+from app.services.usage_rollups import ROLLUP_NAME
+
+router = APIRouter()
+
+USAGE_GROUPS = {"day": UsageDaily.day, "client": UsageDaily.client_id, "user": UsageDaily.user_id}
+
+def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
+    if current_user.email.lower() not in {email.lower() for email in settings.ADMIN_EMAILS}:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user
+
+@router.get("/profiles")
+async def list_profiles(admin: User = Depends(get_admin_user)) -> List[dict]:
+    """Recent request profiles of this API process, newest first"""
+    return [profile.summary() for profile in recent_profiles()]
+
+@router.get("/profiles/{profile_id}")
+async def get_profile_detail(profile_id: str, admin: User = Depends(get_admin_user)) -> dict:
+    profile = get_profile(profile_id)
+    if not profile:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return profile.detail()
+
+@router.get("/usage")
+@query_budget(2)
+async def get_usage(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    client_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    group_by: str = Query("day", description="Comma-separated: day, client, user"),
+    admin: User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+) -> dict:
+    """
+    Usage totals from the usage_daily rollup, for days in [start, end]
+    (default: the last 30 days). `through` is the rollup watermark: activity
+    after it is not counted yet.
+    """
+    groups = [name.strip() for name in group_by.split(",") if name.strip()]
+    unknown = [name for name in groups if name not in USAGE_GROUPS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown group_by: {', '.join(unknown)}"
+        )
+
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=29)
+    columns = [USAGE_GROUPS[name].label(f"{name}_id" if name != "day" else name) for name in groups]
+    query = (
+        select(
+            *columns,
+            func.sum(UsageDaily.messages).label("messages"),
+            func.sum(UsageDaily.voice_messages).label("voice_messages"),
+            func.sum(UsageDaily.documents).label("documents"),
+            func.sum(UsageDaily.document_bytes).label("document_bytes"),
+        )
+        .where(UsageDaily.day >= start, UsageDaily.day <= end)
+        .group_by(*columns)
+        .order_by(*columns)
+    )
+    if client_id is not None:
+        query = query.where(UsageDaily.client_id == client_id)
+    if user_id is not None:
+        query = query.where(UsageDaily.user_id == user_id)
+
+    rows = []
+    for row in db.execute(query).mappings():
+        if row["messages"] is None:
+            continue  # no rollup rows in range
+        entry = dict(row)
+        for key in ("messages", "voice_messages", "documents", "document_bytes"):
+            entry[key] = int(entry[key])
+        entry["text_messages"] = entry["messages"] - entry["voice_messages"]
+        rows.append(entry)
+
+    watermark = db.execute(
+        select(RollupWatermark.watermark).where(RollupWatermark.name == ROLLUP_NAME)
+    ).scalar()
+    return {"start": start, "end": end, "through": watermark, "rows": rows}
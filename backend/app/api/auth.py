@@ -1,21 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm, HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+import logging
 import uuid
 
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import get_db, set_session_user
+from app.core.profiling import timed, query_budget
+from app.core.token_cache import token_cache
 from app.models.user import User
 from app.models.client import Client
 from app.models.user_chat import UserChat
-from app.schemas.auth import UserCreate, UserLogin, Token, TokenData, SigninRequest, SigninResponse, UserResponse
+from app.schemas.auth import UserCreate, UserLogin, Token, TokenData, SigninRequest, SigninResponse, UserResponse, SessionResponse
+from app.services.token_revocation import is_revoked, revoke_token, record_session, list_sessions, get_session
 
 router = APIRouter()
 
+logger = logging.getLogger("alphalabs.auth")
+
 # JWT Constants
 JWT_ALGORITHM = 'HS256'
 JWT_ISSUER = {
@@ -24,6 +30,7 @@ JWT_ISSUER = {
     'environment': settings.ENVIRONMENT,
     'url': 'http://localhost:8000'
 }
+JWT_AUDIENCE = f"{settings.ENVIRONMENT}-alpha-labs-mobile"
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -33,10 +40,12 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 security = HTTPBearer()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    with timed("bcrypt"):
+        return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    with timed("bcrypt"):
+        return pwd_context.hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -48,41 +57,51 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def generate_jwt_token(user: User, client_id: int = 1) -> str:
+def generate_jwt_token(user: User, client_id: int = 1, jti: Optional[str] = None, now: Optional[datetime] = None,
+                       compact: Optional[bool] = None) -> str:
     """Generate JWT token with enhanced claims similar to alpha-labs-platform"""
-    now = datetime.utcnow()
+    now = now or datetime.utcnow()
+    if compact is None:
+        compact = settings.JWT_COMPACT_CLAIMS
     
-    # Generate JWT token with enhanced claims
-    token = jwt.encode({
+    claims = {
         # Standard JWT claims
         'iss': JWT_ISSUER['name'],           # Issuer name
         'sub': str(user.id),                 # Subject (user ID)
-        'aud': f"{settings.ENVIRONMENT}-alpha-labs-mobile",  # Audience
+        'aud': JWT_AUDIENCE,                 # Audience
         'iat': now,                          # Issued at
-        'exp': now + timedelta(days=1),      # Expiration
-        'jti': str(uuid.uuid4()),            # JWT ID
-        
-        # Custom issuer claims
-        'issuer': {
-            'name': JWT_ISSUER['name'],
-            'version': JWT_ISSUER['version'],
-            'environment': JWT_ISSUER['environment'],
-            'url': JWT_ISSUER['url']
-        },
-        
-        # User claims
-        'user': {
-            'id': user.id,
-            'name': user.name,
-            'email': user.email,
-            'client_id': client_id,
-            'created_at': user.created_on.isoformat() if user.created_on else None
-        },
-        
-        # Token metadata
-        'token_type': 'access',
-        'token_use': 'api_access'
-    }, settings.SECRET_KEY, algorithm=JWT_ALGORITHM)
+        'exp': now + timedelta(hours=settings.JWT_TOKEN_LIFETIME_HOURS),  # Expiration
+        'jti': jti or str(uuid.uuid4()),     # JWT ID
+    }
+    
+    if compact:
+        # Compact layout: the user is `sub`, everything else is looked up server-side
+        claims['cid'] = client_id
+    else:
+        claims.update({
+            # Custom issuer claims
+            'issuer': {
+                'name': JWT_ISSUER['name'],
+                'version': JWT_ISSUER['version'],
+                'environment': JWT_ISSUER['environment'],
+                'url': JWT_ISSUER['url']
+            },
+            
+            # User claims
+            'user': {
+                'id': user.id,
+                'name': user.name,
+                'email': user.email,
+                'client_id': client_id,
+                'created_at': user.created_on.isoformat() if user.created_on else None
+            },
+            
+            # Token metadata
+            'token_type': 'access',
+            'token_use': 'api_access'
+        })
+    
+    token = jwt.encode(claims, settings.SECRET_KEY, algorithm=JWT_ALGORITHM)
     
     return token
 
@@ -97,54 +116,91 @@ def authenticate_user(db: Session, email: str, password: str):
         return False
     return user
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
-    # Dev bypass when enabled
-    if settings.DISABLE_AUTH:
-        # Return the first user or create the test user if none exists
-        user = db.query(User).first()
-        if user:
-            return user
-        # Create test user if not present
-        hashed = get_password_hash(settings.TEST_USER_PASSWORD)
-        user = User(email=settings.TEST_USER_EMAIL, name=settings.TEST_USER_NAME, password=hashed)
-        db.add(user)
-        db.commit()
-        db.refresh(user)
+def get_dev_user(db: Session) -> User:
+    """User for the DISABLE_AUTH dev bypass"""
+    # Return the first user or create the test user if none exists
+    user = db.query(User).first()
+    if user:
+        set_session_user(db, user.id)
         return user
+    # Create test user if not present
+    hashed = get_password_hash(settings.TEST_USER_PASSWORD)
+    user = User(email=settings.TEST_USER_EMAIL, name=settings.TEST_USER_NAME, password=hashed)
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
 
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """Verify a bearer token and return its claims, raising 401 if it is invalid or revoked"""
+    # Clients reuse one token for many requests; skip re-verifying it each time
+    payload = token_cache.get(token)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[JWT_ALGORITHM], audience=JWT_AUDIENCE)
+        except JWTError as e:
+            # Rate-limited per call site by the logging pipeline
+            logger.warning(f"Rejected token: {e}")
+            raise _credentials_exception()
+        token_cache.put(token, payload)
+    jti = payload.get("jti")
+    if jti and is_revoked(jti):
+        logger.warning(f"Rejected revoked token {jti}")
+        raise _credentials_exception()
+    return payload
+
+def get_user_from_token(token: str, db: Session) -> User:
+    """Resolve a bearer token to its user, raising 401 if it is not valid"""
+    credentials_exception = _credentials_exception()
     try:
-        # Extract token from credentials
-        token = credentials.credentials
-        
-        # Decode the JWT token
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        payload = decode_token(token)
         
-        user_id_claim = payload.get("user", {}).get("id")
+        # Full tokens carry user.id, compact ones only sub
+        user_id_claim = payload.get("user", {}).get("id") or payload.get("sub")
         if user_id_claim is None:
+            logger.warning("Rejected token without a user id claim")
             raise credentials_exception
         # Coerce to integer to match database column type
         try:
             user_id = int(user_id_claim)
         except (TypeError, ValueError):
             raise credentials_exception
+        set_session_user(db, user_id)
             
         # Get user from database
         user = db.query(User).filter(User.id == user_id).first()
         if user is None:
+            logger.warning(f"Rejected token for unknown user {user_id}")
             raise credentials_exception
             
         return user
         
-    except JWTError:
-        raise credentials_exception
+    except HTTPException:
+        raise
     except Exception as e:
+        logger.warning(f"Could not validate token: {e}")
         raise credentials_exception
 
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
+    # Dev bypass when enabled
+    if settings.DISABLE_AUTH:
+        return get_dev_user(db)
+
+    return get_user_from_token(credentials.credentials, db)
+
+async def get_token_claims(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
+    """Claims of the presented token (sessions and logout need its jti)"""
+    if settings.DISABLE_AUTH:
+        return {}
+    return decode_token(credentials.credentials)
+
 @router.post("/register", response_model=Token)
 async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     # Check if user already exists
@@ -192,6 +248,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/signin", response_model=SigninResponse)
+@query_budget(2)
 async def signin(request: SigninRequest, http_request: Request, db: Session = Depends(get_db)):
     """Signin endpoint similar to alpha-labs-platform"""
     user = db.query(User).filter_by(email=request.email).first()
@@ -207,8 +264,16 @@ async def signin(request: SigninRequest, http_request: Request, db: Session = De
         db.commit()
         db.refresh(client)
     
-    # Generate JWT token
-    token = generate_jwt_token(user, client.id)
+    # Generate JWT token and record it as a session the user can revoke
+    jti, now = str(uuid.uuid4()), datetime.utcnow()
+    token = generate_jwt_token(user, client.id, jti=jti, now=now)
+    record_session(
+        user.id, jti, client.id,
+        issued_at=now,
+        expires_at=now + timedelta(hours=settings.JWT_TOKEN_LIFETIME_HOURS),
+        user_agent=http_request.headers.get("user-agent"),
+        ip=http_request.client.host if http_request.client else None,
+    )
     
     # Create user response
     user_response = UserResponse(
@@ -225,6 +290,47 @@ async def signin(request: SigninRequest, http_request: Request, db: Session = De
         issuer=JWT_ISSUER
     )
 
+@router.get("/sessions", response_model=List[SessionResponse])
+async def get_sessions(
+    current_user: User = Depends(get_current_user),
+    claims: Dict[str, Any] = Depends(get_token_claims)
+):
+    """Active signin sessions of the current user"""
+    return [
+        {**session, "current": session["jti"] == claims.get("jti")}
+        for session in list_sessions(current_user.id)
+    ]
+
+@router.delete("/sessions/{jti}", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_session(jti: str, current_user: User = Depends(get_current_user)):
+    session = get_session(current_user.id, jti)
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found"
+        )
+    if not revoke_token(jti, datetime.fromisoformat(session["expires_at"]), current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Session revocation is unavailable"
+        )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    current_user: User = Depends(get_current_user),
+    claims: Dict[str, Any] = Depends(get_token_claims)
+):
+    """Revoke the presented token"""
+    if claims.get("jti") and not revoke_token(
+        claims["jti"], datetime.utcfromtimestamp(claims["exp"]), current_user.id
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Session revocation is unavailable"
+        )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
 @router.get("/me")
 async def read_users_me(current_user: User = Depends(get_current_user)):
     return {
@@ -1,17 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query, WebSocket, WebSocketDisconnect
+from sqlalchemy import delete
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
+import asyncio
+import json
+import logging
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_db, SessionLocal, reads_from_primary
 from app.models.user import User
 from app.models.client import Client
 from app.models.user_chat import UserChat
 from app.models.chat_message import ChatMessage
-from app.api.auth import get_current_user
-from app.schemas.chat import ChatMessageCreate, ChatMessageResponse, ChatCreate, ChatResponse
+from app.models.chat_message_archive import ChatMessageArchive
+from app.services.partitions import archive_cutoff
+from app.services.chat_activity import chat_activity_at
+from app.services.chat_messages import CHAT_REPLY_JOB, generate_reply, record_message, message_response
+from app.services.conversation_context import build_context
+from app.services.jobs import FINISHED, get_job_queue
+from app.services.list_versions import get_list_version, bump_list_version
+from app.services.sync import CHAT, DELETE, record_change
+from app.services.transcription import Transcriber, TranscriberUnavailable, create_transcriber
+from app.core.http_cache import make_etag, not_modified, list_response
+from app.core.profiling import query_budget
+from app.api.auth import get_current_user, get_dev_user, get_user_from_token
+from app.schemas.chat import ChatMessageCreate, ChatMessageResponse, ChatCreate, ChatResponse, ChatJobResponse
 
 router = APIRouter()
+logger = logging.getLogger("alphalabs.chat")
 
 @router.post("/", response_model=ChatResponse)
 async def create_chat(
@@ -35,8 +52,11 @@ async def create_chat(
         title=chat_data.title or f"Chat {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}"
     )
     db.add(db_chat)
+    db.flush()
+    record_change(db, current_user.id, CHAT, db_chat.id)
     db.commit()
     db.refresh(db_chat)
+    bump_list_version(current_user.id, "chats")
     
     return {
         "id": db_chat.id,
@@ -47,6 +67,7 @@ async def create_chat(
     }
 
 @router.post("/{chat_id}/messages", response_model=ChatMessageResponse)
+@query_budget(8)
 async def send_message(
     chat_id: int,
     message_data: ChatMessageCreate,
@@ -65,37 +86,234 @@ async def send_message(
             detail="Chat not found"
         )
     
-    # For now, simulate AI response (you can integrate with your AI service later)
-    ai_response = f"AI Response to: {message_data.content}"
+    context = build_context(db, chat_id, message_data.content)
+    ai_response = generate_reply(message_data.content, context)
     
-    # Create user message
-    user_message = ChatMessage(
-        user_chat_id=chat_id,
-        user_id=current_user.id,
+    user_message = record_message(
+        db,
+        chat_id=chat_id,
         client_id=chat.client_id,
+        user_id=current_user.id,
         prompt=message_data.content,
         response=ai_response,
-        is_voice=1 if message_data.is_voice else 0
+        is_voice=message_data.is_voice,
+        context=context
     )
-    db.add(user_message)
-    
-    # Update chat last message timestamp
-    chat.last_message = datetime.utcnow()
-    
-    db.commit()
-    db.refresh(user_message)
     
+    return message_response(user_message)
+
+def _job_response(job: dict) -> dict:
     return {
-        "id": user_message.id,
-        "content": user_message.prompt,
-        "response": user_message.response,
-        "is_voice": bool(user_message.is_voice),
-        "created_on": user_message.created_on
+        "job_id": job["id"],
+        "status": job["status"],
+        "chat_id": job["payload"]["chat_id"],
+        "result": job.get("result"),
+        "error": job.get("error"),
     }
 
+@router.post("/{chat_id}/jobs", response_model=ChatJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_message(
+    chat_id: int,
+    message_data: ChatMessageCreate,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Queue a message for a reply; poll or subscribe to the job for the result"""
+    chat = db.query(UserChat).filter(
+        UserChat.id == chat_id,
+        UserChat.user_id == current_user.id
+    ).first()
+    
+    if not chat:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chat not found"
+        )
+    client_id = chat.client_id
+    
+    # Hand the pooled connection back before touching the queue
+    db.close()
+    
+    job = await get_job_queue().submit(CHAT_REPLY_JOB, {
+        "chat_id": chat_id,
+        "client_id": client_id,
+        "user_id": current_user.id,
+        "content": message_data.content,
+        "is_voice": message_data.is_voice,
+    }, owner_id=current_user.id)
+    
+    response.headers["Location"] = f"/api/chat/jobs/{job['id']}"
+    return _job_response(job)
+
+async def _get_owned_job(job_id: str, user_id: int) -> dict:
+    job = await get_job_queue().get(job_id)
+    if job is None or job["owner_id"] != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return job
+
+@router.get("/jobs/{job_id}", response_model=ChatJobResponse)
+async def get_message_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, description="Seconds to long-poll for completion"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    user_id = current_user.id
+    # Don't hold a pooled connection while long-polling
+    db.close()
+    
+    job = await _get_owned_job(job_id, user_id)
+    if wait and job["status"] not in FINISHED:
+        job = await get_job_queue().wait(job_id, min(wait, settings.JOB_WAIT_TIMEOUT_SECONDS)) or job
+    return _job_response(job)
+
+@router.websocket("/jobs/{job_id}/ws")
+async def watch_message_job(websocket: WebSocket, job_id: str, token: str = Query(None)):
+    """Push the job result once it finishes. Authenticate with ?token=<jwt>"""
+    db = SessionLocal()
+    try:
+        user = get_dev_user(db) if settings.DISABLE_AUTH else get_user_from_token(token or "", db)
+        user_id = user.id
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    finally:
+        db.close()
+    
+    try:
+        job = await _get_owned_job(job_id, user_id)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    
+    await websocket.accept()
+    while job["status"] not in FINISHED:
+        job = await get_job_queue().wait(job_id, settings.JOB_WAIT_TIMEOUT_SECONDS)
+        if job is None:
+            await websocket.close(code=1011)
+            return
+    await websocket.send_json(ChatJobResponse(**_job_response(job)).model_dump(mode="json"))
+    await websocket.close()
+
+async def _voice_error(websocket: WebSocket, detail: str, code: int = 1008):
+    await websocket.send_json({"type": "error", "detail": detail})
+    await websocket.close(code=code)
+
+async def _receive_transcript(websocket: WebSocket, transcriber: Transcriber) -> Optional[str]:
+    """Feed audio frames to the transcriber until the client ends the recording"""
+    received = 0
+    while True:
+        try:
+            message = await asyncio.wait_for(websocket.receive(), settings.VOICE_IDLE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            await _voice_error(websocket, "Recording timed out")
+            return None
+        if message["type"] == "websocket.disconnect":
+            return None
+        
+        if message.get("bytes") is not None:
+            chunk = message["bytes"]
+            received += len(chunk)
+            if received > settings.VOICE_MAX_BYTES:
+                await _voice_error(websocket, "Recording too large", code=1009)
+                return None
+            partial = await asyncio.to_thread(transcriber.feed, chunk)
+            if partial is not None:
+                await websocket.send_json({"type": "partial", "text": partial})
+            continue
+        
+        try:
+            control = json.loads(message.get("text") or "")
+        except ValueError:
+            control = None
+        kind = control.get("type") if isinstance(control, dict) else None
+        if kind == "end":
+            return await asyncio.to_thread(transcriber.finish)
+        if kind == "cancel":
+            await websocket.close()
+            return None
+        await _voice_error(websocket, "Expected audio or {\"type\": \"end\"}")
+        return None
+
+@router.websocket("/{chat_id}/voice")
+async def stream_voice_message(websocket: WebSocket, chat_id: int, token: str = Query(None)):
+    """
+    Record a voice message and send its transcript as the prompt.
+    Authenticate with ?token=<jwt>, send audio as binary frames while recording
+    and {"type": "end"} when done (or {"type": "cancel"}). The server sends
+    {"type": "partial", "text"} as the transcript grows, {"type": "final", "text"},
+    then {"type": "job", ...} and {"type": "result", ...} once the reply is ready.
+    """
+    db = SessionLocal()
+    try:
+        user = get_dev_user(db) if settings.DISABLE_AUTH else get_user_from_token(token or "", db)
+        user_id = user.id
+        chat = db.query(UserChat).filter(
+            UserChat.id == chat_id,
+            UserChat.user_id == user_id
+        ).first()
+        if not chat:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Chat not found"
+            )
+        client_id = chat.client_id
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    finally:
+        db.close()
+    
+    await websocket.accept()
+    try:
+        transcriber = await asyncio.to_thread(create_transcriber)
+    except TranscriberUnavailable as e:
+        logger.error(f"Voice message refused: {e}")
+        await _voice_error(websocket, "Voice messages are not available", code=1011)
+        return
+    try:
+        transcript = await _receive_transcript(websocket, transcriber)
+    except WebSocketDisconnect:
+        return
+    finally:
+        await asyncio.to_thread(transcriber.close)
+    if transcript is None:
+        return
+    
+    await websocket.send_json({"type": "final", "text": transcript})
+    if not transcript:
+        await websocket.send_json({"type": "error", "detail": "No speech recognised"})
+        await websocket.close()
+        return
+    
+    queue = get_job_queue()
+    job = await queue.submit(CHAT_REPLY_JOB, {
+        "chat_id": chat_id,
+        "client_id": client_id,
+        "user_id": user_id,
+        "content": transcript,
+        "is_voice": True,
+    }, owner_id=user_id)
+    await websocket.send_json({"type": "job", **ChatJobResponse(**_job_response(job)).model_dump(mode="json")})
+    
+    while job["status"] not in FINISHED:
+        job = await queue.wait(job["id"], settings.JOB_WAIT_TIMEOUT_SECONDS)
+        if job is None:
+            await websocket.close(code=1011)
+            return
+    await websocket.send_json({"type": "result", **ChatJobResponse(**_job_response(job)).model_dump(mode="json")})
+    await websocket.close()
+
 @router.get("/{chat_id}/messages", response_model=List[ChatMessageResponse])
+@query_budget(3)
 async def get_chat_messages(
     chat_id: int,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -111,12 +329,28 @@ async def get_chat_messages(
             detail="Chat not found"
         )
     
+    # Answer unchanged histories without loading them
+    version = get_list_version(current_user.id, f"messages:{chat_id}") if reads_from_primary(db) else None
+    etag = make_etag("messages", chat_id, version) if version else None
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    # Older turns may have been tiered out to the archive table; only chats
+    # that started before the archive cutoff can have rows there
+    messages = []
+    cutoff = archive_cutoff()
+    if cutoff is not None and chat.created_on < cutoff:
+        messages = db.query(ChatMessageArchive).filter(
+            ChatMessageArchive.user_chat_id == chat_id
+        ).order_by(ChatMessageArchive.created_on.asc()).all()
+
     # Get messages
-    messages = db.query(ChatMessage).filter(
+    messages += db.query(ChatMessage).filter(
         ChatMessage.user_chat_id == chat_id
     ).order_by(ChatMessage.created_on.asc()).all()
     
-    return [
+    body = [
         {
             "id": msg.id,
             "content": msg.prompt,
@@ -126,17 +360,28 @@ async def get_chat_messages(
         }
         for msg in messages
     ]
+    return list_response(request, response, etag, "messages", body)
 
 @router.get("/", response_model=List[ChatResponse])
+@query_budget(2)
 async def get_user_chats(
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    # Answer an unchanged chat list without running the list query
+    version = get_list_version(current_user.id, "chats") if reads_from_primary(db) else None
+    etag = make_etag("chats", current_user.id, version) if version else None
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
     chats = db.query(UserChat).filter(
         UserChat.user_id == current_user.id
-    ).order_by(UserChat.last_message.desc().nullslast(), UserChat.created_on.desc()).all()
+    ).order_by(chat_activity_at().desc().nullslast(), UserChat.created_on.desc()).all()
     
-    return [
+    body = [
         {
             "id": chat.id,
             "title": chat.title,
@@ -145,4 +390,32 @@ async def get_user_chats(
             "created_on": chat.created_on
         }
         for chat in chats
-    ] 
\ No newline at end of file
+    ]
+    return list_response(request, response, etag, "chats", body)
+
+@router.delete("/{chat_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_chat(
+    chat_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # Single set-based DELETE; chat_messages rows go with it via ON DELETE CASCADE
+    result = db.execute(
+        delete(UserChat).where(
+            UserChat.id == chat_id,
+            UserChat.user_id == current_user.id
+        ),
+        execution_options={"synchronize_session": False}
+    )
+
+    if result.rowcount == 0:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chat not found"
+        )
+
+    record_change(db, current_user.id, CHAT, chat_id, DELETE)
+    db.commit()
+    bump_list_version(current_user.id, "chats", f"messages:{chat_id}")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
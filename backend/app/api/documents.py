@@ -1,25 +1,133 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Request, Response, BackgroundTasks
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+import asyncio
 import os
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
+from jose import JWTError, jwt
 
-from app.core.database import get_db
+from app.core.database import get_db, reads_from_primary
 from app.core.config import settings
+from app.core.storage import get_storage, storage_key
 from app.models.user import User
 from app.models.document import Document
 from app.api.auth import get_current_user
-from app.schemas.document import DocumentResponse, DocumentCreate
+from app.schemas.document import DocumentResponse, DocumentCreate, DirectUploadCreate, DirectUploadResponse, DirectUploadComplete
+from app.services.image_variants import IMAGE_MIME_TYPES, generate_document_variants
+from app.services.list_versions import get_list_version, bump_list_version
+from app.services.sync import DOCUMENT, DELETE, record_change
+from app.core.http_cache import make_etag, not_modified, list_response
+from app.core.profiling import query_budget
 
 router = APIRouter()
 
+def _content_url(document: Document, key: str, variant: str = None) -> str:
+    # Local files are served statically; otherwise the content endpoint redirects
+    url = get_storage().public_url(key)
+    if url:
+        return url
+    return f"/api/documents/{document.id}/content" + (f"?variant={variant}" if variant else "")
+
+def document_response(document: Document) -> dict:
+    return {
+        "id": document.id,
+        "title": document.title,
+        "original_filename": document.original_filename,
+        "file_size": document.file_size,
+        "mime_type": document.mime_type,
+        "uploaded_by": document.uploaded_by,
+        "created_on": document.created_on,
+        "url": _content_url(document, storage_key(document.file_path)),
+        "placeholder": document.placeholder,
+        "variants": [
+            {
+                "name": variant["name"],
+                "url": _content_url(document, storage_key(variant["file_path"]), variant["name"]),
+                "width": variant["width"],
+                "height": variant["height"],
+                "file_size": variant["file_size"],
+                "mime_type": variant["mime_type"],
+            }
+            for variant in document.variants or []
+        ],
+    }
+
+ALLOWED_MIME_TYPES = [
+    "application/pdf",
+    "text/plain",
+    "application/msword",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "image/jpeg",
+    "image/png"
+]
+
+# Upload tokens are signed with SECRET_KEY but can never pass as access tokens
+UPLOAD_TOKEN_AUDIENCE = "alpha-labs-document-upload"
+
+def _check_mime_type(mime_type: Optional[str]):
+    if mime_type not in ALLOWED_MIME_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File type not allowed"
+        )
+
+def _new_key(filename: str) -> str:
+    return f"{uuid.uuid4()}{os.path.splitext(filename)[1]}"
+
+def _create_document(
+    db: Session,
+    background_tasks: BackgroundTasks,
+    user_id: int,
+    key: str,
+    filename: str,
+    title: Optional[str],
+    file_size: int,
+    mime_type: str
+) -> Document:
+    # Get or create default client
+    from app.models.client import Client
+    client = db.query(Client).filter(Client.id == 1).first()
+    if not client:
+        client = Client(name="Default Client", description="Default client for mobile app")
+        db.add(client)
+        db.commit()
+        db.refresh(client)
+    
+    # Create document record
+    document = Document(
+        client_id=client.id,
+        title=title or filename,
+        original_filename=filename,
+        file_path=key,
+        file_size=file_size,
+        mime_type=mime_type,
+        uploaded_by=user_id
+    )
+    
+    db.add(document)
+    db.flush()
+    record_change(db, user_id, DOCUMENT, document.id)
+    db.commit()
+    db.refresh(document)
+    bump_list_version(user_id, "documents")
+    
+    # Thumbnails and placeholder are generated off the request path
+    if document.mime_type in IMAGE_MIME_TYPES:
+        background_tasks.add_task(generate_document_variants, document.id, user_id, key)
+    return document
+
 @router.post("/upload", response_model=DocumentResponse)
 async def upload_document(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    """Upload through the API; with S3 storage prefer the direct upload flow below"""
     # Validate file size
     if file.size and file.size > settings.MAX_FILE_SIZE:
         raise HTTPException(
@@ -27,94 +135,151 @@ async def upload_document(
             detail=f"File size exceeds maximum limit of {settings.MAX_FILE_SIZE} bytes"
         )
     
-    # Validate file type (basic check)
-    allowed_types = [
-        "application/pdf",
-        "text/plain",
-        "application/msword",
-        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        "image/jpeg",
-        "image/png"
-    ]
-    
-    if file.content_type not in allowed_types:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="File type not allowed"
-        )
+    _check_mime_type(file.content_type)
+    key = _new_key(file.filename)
     
-    # Generate unique filename
-    file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
-    
-    # Save file
+    # Stream the spooled upload to storage without reading it into memory
     try:
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        file_size = await asyncio.to_thread(get_storage().save, key, file.file, file.content_type)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to save file: {str(e)}"
         )
     
-    # Get or create default client
-    from app.models.client import Client
-    client = db.query(Client).filter(Client.id == 1).first()
-    if not client:
-        client = Client(name="Default Client", description="Default client for mobile app")
-        db.add(client)
-        db.commit()
-        db.refresh(client)
-    
-    # Create document record
-    document = Document(
-        client_id=client.id,
-        title=file.filename,
-        original_filename=file.filename,
-        file_path=file_path,
-        file_size=len(content),
-        mime_type=file.content_type,
-        uploaded_by=current_user.id
+    document = _create_document(
+        db, background_tasks, current_user.id, key,
+        file.filename, file.filename, file_size, file.content_type
     )
+    return document_response(document)
+
+@router.post("/uploads", response_model=DirectUploadResponse)
+async def create_direct_upload(
+    upload: DirectUploadCreate,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Start a direct upload: POST the file to `url` as multipart form data with
+    `fields` (file last), then call /uploads/complete with `upload_token`.
+    The storage backend enforces the type and MAX_FILE_SIZE.
+    """
+    _check_mime_type(upload.mime_type)
+    key = _new_key(upload.filename)
+    presigned = await asyncio.to_thread(
+        get_storage().presigned_upload, key, upload.mime_type, settings.MAX_FILE_SIZE
+    )
+    if presigned is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Direct uploads need the s3 storage backend; use /api/documents/upload"
+        )
     
-    db.add(document)
-    db.commit()
-    db.refresh(document)
-    
+    expires_in = settings.S3_PRESIGN_EXPIRES_SECONDS
+    upload_token = jwt.encode({
+        "aud": UPLOAD_TOKEN_AUDIENCE,
+        "sub": str(current_user.id),
+        "key": key,
+        "filename": upload.filename,
+        "title": upload.title,
+        "mime_type": upload.mime_type,
+        # Leave time to finish a slow upload before completing it
+        "exp": datetime.utcnow() + timedelta(seconds=expires_in * 2),
+    }, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return {
-        "id": document.id,
-        "title": document.title,
-        "original_filename": document.original_filename,
-        "file_size": document.file_size,
-        "mime_type": document.mime_type,
-        "uploaded_by": document.uploaded_by,
-        "created_on": document.created_on
+        "upload_token": upload_token,
+        "url": presigned["url"],
+        "fields": presigned["fields"],
+        "expires_in": expires_in,
     }
 
+def _completed_upload(db: Session, user_id: int, key: str) -> Optional[Document]:
+    """The document already recorded for an upload; 404 if it was deleted since"""
+    existing = db.query(Document).filter(
+        Document.uploaded_by == user_id,
+        Document.file_path == key
+    ).first()
+    if existing and existing.is_deleted:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    return existing
+
+@router.post("/uploads/complete", response_model=DocumentResponse)
+async def complete_direct_upload(
+    upload: DirectUploadComplete,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Record a file uploaded with /uploads as a document; safe to retry"""
+    try:
+        claims = jwt.decode(
+            upload.upload_token, settings.SECRET_KEY,
+            algorithms=[settings.ALGORITHM], audience=UPLOAD_TOKEN_AUDIENCE
+        )
+    except JWTError:
+        claims = None
+    if not claims or claims.get("sub") != str(current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid or expired upload token"
+        )
+    key = claims["key"]
+    
+    existing = _completed_upload(db, current_user.id, key)
+    if existing:
+        return document_response(existing)
+    
+    storage = get_storage()
+    file_size = await asyncio.to_thread(storage.size, key)
+    if file_size is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File has not been uploaded"
+        )
+    if file_size > settings.MAX_FILE_SIZE:
+        await asyncio.to_thread(storage.delete, key)
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File size exceeds maximum limit of {settings.MAX_FILE_SIZE} bytes"
+        )
+    
+    try:
+        document = _create_document(
+            db, background_tasks, current_user.id, key,
+            claims["filename"], claims.get("title"), file_size, claims["mime_type"]
+        )
+    except IntegrityError:
+        # A concurrent retry recorded it first (file_path is unique)
+        db.rollback()
+        document = _completed_upload(db, current_user.id, key)
+        if document is None:
+            raise
+    return document_response(document)
+
 @router.get("/", response_model=List[DocumentResponse])
+@query_budget(2)
 async def get_user_documents(
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    # Answer an unchanged document list without running the list query
+    version = get_list_version(current_user.id, "documents") if reads_from_primary(db) else None
+    etag = make_etag("documents", current_user.id, version) if version else None
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
     documents = db.query(Document).filter(
         Document.uploaded_by == current_user.id,
         Document.is_deleted == False
     ).order_by(Document.created_on.desc()).all()
     
-    return [
-        {
-            "id": doc.id,
-            "title": doc.title,
-            "original_filename": doc.original_filename,
-            "file_size": doc.file_size,
-            "mime_type": doc.mime_type,
-            "uploaded_by": doc.uploaded_by,
-            "created_on": doc.created_on
-        }
-        for doc in documents
-    ]
+    body = [document_response(doc) for doc in documents]
+    return list_response(request, response, etag, "documents", body)
 
 @router.get("/{document_id}", response_model=DocumentResponse)
 async def get_document(
@@ -134,12 +299,77 @@ async def get_document(
             detail="Document not found"
         )
     
-    return {
-        "id": document.id,
-        "title": document.title,
-        "original_filename": document.original_filename,
-        "file_size": document.file_size,
-        "mime_type": document.mime_type,
-        "uploaded_by": document.uploaded_by,
-        "created_on": document.created_on
-    } 
\ No newline at end of file
+    return document_response(document)
+
+@router.get("/{document_id}/content")
+async def get_document_content(
+    document_id: int,
+    variant: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Redirect to a presigned URL when the backend has one, otherwise send the file"""
+    document = db.query(Document).filter(
+        Document.id == document_id,
+        Document.uploaded_by == current_user.id,
+        Document.is_deleted == False
+    ).first()
+    
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    
+    key, mime_type, filename = storage_key(document.file_path), document.mime_type, document.original_filename
+    if variant:
+        match = next((v for v in document.variants or [] if v["name"] == variant), None)
+        if not match:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Variant not found"
+            )
+        key, mime_type = storage_key(match["file_path"]), match["mime_type"]
+        filename = os.path.basename(key)
+    
+    storage = get_storage()
+    url = storage.presigned_url(key, filename=filename, content_type=mime_type)
+    if url:
+        return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+    path = storage.local_path(key)
+    if path:
+        if not os.path.isfile(path):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="File not found"
+            )
+        return FileResponse(path, media_type=mime_type, filename=filename, content_disposition_type="inline")
+    return StreamingResponse(storage.open(key), media_type=mime_type)
+
+@router.delete("/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_document(
+    document_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # Soft delete only; the background reaper removes the file and the row
+    result = db.execute(
+        update(Document).where(
+            Document.id == document_id,
+            Document.uploaded_by == current_user.id,
+            Document.is_deleted == False
+        ).values(is_deleted=True),
+        execution_options={"synchronize_session": False}
+    )
+
+    if result.rowcount == 0:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+
+    record_change(db, current_user.id, DOCUMENT, document_id, DELETE)
+    db.commit()
+    bump_list_version(current_user.id, "documents")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,67 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import datetime
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.profiling import query_budget
+from app.models.user import User
+from app.api.auth import get_current_user
+from app.api.documents import document_response
+from app.services.chat_messages import message_response
+from app.services.sync import encode_cursor, decode_cursor, cursor_expired, current_position, fetch_changes
+from app.schemas.sync import SyncResponse
+
+router = APIRouter()
+
+@router.get("/", response_model=SyncResponse)
+@query_budget(6)
+async def sync(
+    since: Optional[str] = None,
+    limit: int = Query(None, ge=1, le=1000),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Changes since `since`. Without a cursor, or with one older than the change
+    log retention, only a fresh cursor is returned with `full_resync` set: the
+    client reloads its lists and syncs from that cursor afterwards. Keep
+    calling while `has_more` is true.
+    """
+    decoded = decode_cursor(since) if since else None
+    if since and decoded is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid sync cursor"
+        )
+
+    if decoded is None or cursor_expired(decoded[1]):
+        return {
+            "cursor": encode_cursor(current_position(db, current_user.id)),
+            "full_resync": True,
+            "server_time": datetime.utcnow(),
+        }
+
+    changes = fetch_changes(db, current_user.id, decoded[0], limit or settings.SYNC_PAGE_SIZE)
+    return {
+        "cursor": encode_cursor(changes["position"]),
+        "has_more": changes["has_more"],
+        "server_time": datetime.utcnow(),
+        "chats": [
+            {
+                "id": chat.id,
+                "title": chat.title,
+                "user_id": chat.user_id,
+                "client_id": chat.client_id,
+                "created_on": chat.created_on
+            }
+            for chat in changes["chats"]
+        ],
+        "messages": [
+            {**message_response(message), "chat_id": message.user_chat_id}
+            for message in changes["messages"]
+        ],
+        "documents": [document_response(document) for document in changes["documents"]],
+        "deleted": changes["deleted"],
+    }
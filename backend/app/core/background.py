@@ -0,0 +1,37 @@
+"""
+Periodic background jobs running on the API event loop.
+
+Jobs are plain synchronous functions; each run happens in a worker thread so
+database and file I/O never block request handling.
+"""
+
+import asyncio
+import logging
+from typing import Callable, List
+
+logger = logging.getLogger("alphalabs.background")
+
+_tasks: List[asyncio.Task] = []
+
+
+async def _run_periodically(name: str, interval: float, job: Callable[[], None]):
+    while True:
+        try:
+            await asyncio.to_thread(job)
+        except Exception as e:
+            logger.warning(f"Background job {name} failed: {e}")
+        await asyncio.sleep(interval)
+
+
+def start_periodic(name: str, interval: float, job: Callable[[], None]):
+    """Run `job` every `interval` seconds until `stop_all` is called"""
+    task = asyncio.create_task(_run_periodically(name, interval, job), name=name)
+    _tasks.append(task)
+    return task
+
+
+async def stop_all():
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
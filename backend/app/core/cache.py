@@ -0,0 +1,55 @@
+"""
+Shared Redis client.
+
+Redis is an optimisation everywhere it is used, never a hard dependency.
+After a failure callers report it through `redis_failed` and `get_redis`
+returns None for REDIS_RETRY_SECONDS, so an outage costs one timeout rather
+than one per request.
+"""
+
+import logging
+import time
+from typing import Optional
+import redis
+
+from app.core.config import settings
+
+logger = logging.getLogger("alphalabs.cache")
+
+_client: Optional[redis.Redis] = None
+_binary_client: Optional[redis.Redis] = None
+_down_until = 0.0
+
+
+def get_redis() -> Optional[redis.Redis]:
+    global _client
+    if time.monotonic() < _down_until:
+        return None
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            decode_responses=True,
+        )
+    return _client
+
+
+def get_redis_binary() -> Optional[redis.Redis]:
+    """Like get_redis, but values come back as bytes (bitmaps, binary blobs)"""
+    global _binary_client
+    if time.monotonic() < _down_until:
+        return None
+    if _binary_client is None:
+        _binary_client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        )
+    return _binary_client
+
+
+def redis_failed(error: Exception):
+    global _down_until
+    _down_until = time.monotonic() + settings.REDIS_RETRY_SECONDS
+    logger.warning(f"Redis unavailable, retrying in {settings.REDIS_RETRY_SECONDS}s: {error}")
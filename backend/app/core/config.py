@@ -5,14 +5,28 @@ import os
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "postgresql://dev:dev@db:5432/alphalabs_mobile"
+    DATABASE_REPLICA_URL: Optional[str] = None  # GET requests read from here when set
+    REPLICA_STICKY_SECONDS: int = 5  # reads stay on the primary this long after a user writes
+    REPLICA_RETRY_SECONDS: int = 15
+    REPLICA_HEALTH_CHECK_SECONDS: int = 10
     
     # Redis
     REDIS_URL: str = "redis://redis:6379/0"
+    REDIS_SOCKET_TIMEOUT: float = 0.5
+    REDIS_RETRY_SECONDS: int = 30
     
     # Security
     SECRET_KEY: str = "your-secret-key-here-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    JWT_TOKEN_LIFETIME_HOURS: int = 24  # signin tokens
+    JWT_COMPACT_CLAIMS: bool = False  # issue tokens with sub/cid only, without the nested issuer/user objects
+    TOKEN_CACHE_SIZE: int = 10000  # verified tokens cached per process
+    
+    # Token revocation (bloom filter size/hashes: ~100k revocations at 1% false positives)
+    REVOCATION_BLOOM_BITS: int = 1 << 20
+    REVOCATION_BLOOM_HASHES: int = 7
+    REVOCATION_REFRESH_SECONDS: float = 2.0
     
     # Environment
     ENVIRONMENT: str = "dev"
@@ -32,9 +46,92 @@ class Settings(BaseSettings):
     # CORS
     BACKEND_CORS_ORIGINS: list = ["*"]
     
+    # Response compression
+    GZIP_MINIMUM_SIZE: int = 1024
+    
+    # Chat message partitioning and archive tiering
+    CHAT_PARTITION_MONTHS_AHEAD: int = 2
+    CHAT_PARTITION_MAINTENANCE_INTERVAL_SECONDS: int = 3600
+    CHAT_ARCHIVE_AFTER_MONTHS: int = 12  # 0 disables archiving
+    CHAT_ARCHIVE_TABLESPACE: Optional[str] = None
+    CHAT_ARCHIVE_COMPRESSION: str = "lz4"  # needs PostgreSQL 14+ built with lz4
+    
+    # Chat activity write-behind
+    CHAT_ACTIVITY_FLUSH_SECONDS: float = 2.0
+    
+    # Chat jobs ("local" runs workers in the API process, "redis" needs worker.py)
+    JOB_QUEUE_BACKEND: str = "local"
+    JOB_WORKERS: int = 4
+    JOB_RESULT_TTL_SECONDS: int = 3600
+    JOB_WAIT_TIMEOUT_SECONDS: float = 25.0
+    JOB_WORKER_HEARTBEAT_SECONDS: int = 10  # a worker silent for 3x this is presumed dead
+    
+    # Conversation context (tokens are estimated at ~4 characters each)
+    CONTEXT_RECENT_TURNS: int = 6
+    CONTEXT_TOKEN_BUDGET: int = 3000
+    CONTEXT_SUMMARY_TOKEN_BUDGET: int = 500
+    CONTEXT_FOLD_LIMIT: int = 50
+    CONTEXT_CACHE_TTL_SECONDS: int = 24 * 3600
+    
+    # Streaming voice messages (see app/services/transcription.py)
+    TRANSCRIBER_BACKEND: Optional[str] = None  # required for voice messages: "vosk" ("stub" is for tests only)
+    VOSK_MODEL_PATH: Optional[str] = None
+    VOICE_SAMPLE_RATE: int = 16000  # of the raw PCM audio frames
+    VOICE_MAX_BYTES: int = 10 * 1024 * 1024  # audio per recording
+    VOICE_IDLE_TIMEOUT_SECONDS: float = 30.0  # between chunks
+    
     # File Upload
     UPLOAD_DIR: str = "uploads"
     MAX_FILE_SIZE: int = 50 * 1024 * 1024  # 50MB
+    DOCUMENT_REAPER_INTERVAL_SECONDS: int = 300
+    DOCUMENT_REAPER_BATCH_SIZE: int = 500
+    
+    # Document storage: "local" (UPLOAD_DIR) or "s3" (any S3-compatible store, e.g. MinIO)
+    STORAGE_BACKEND: str = "local"
+    S3_BUCKET: str = "alphalabs-documents"
+    S3_REGION: str = "us-east-1"
+    S3_ENDPOINT_URL: Optional[str] = None
+    S3_PUBLIC_ENDPOINT_URL: Optional[str] = None  # host used in presigned URLs, if different
+    S3_ACCESS_KEY_ID: Optional[str] = None
+    S3_SECRET_ACCESS_KEY: Optional[str] = None
+    S3_CREATE_BUCKET: bool = False
+    S3_MULTIPART_THRESHOLD: int = 8 * 1024 * 1024
+    S3_MULTIPART_CHUNK_SIZE: int = 8 * 1024 * 1024
+    S3_MAX_CONCURRENCY: int = 8
+    S3_PRESIGN_EXPIRES_SECONDS: int = 900
+    
+    # Image variants (longest edge in pixels per variant name)
+    IMAGE_VARIANT_SIZES: dict = {"thumb": 256, "medium": 1024}
+    IMAGE_VARIANT_QUALITY: int = 80
+    IMAGE_WORKERS: int = 2
+    
+    # Delta sync change log
+    SYNC_PAGE_SIZE: int = 500
+    SYNC_RETENTION_DAYS: int = 30
+    SYNC_PRUNE_INTERVAL_SECONDS: int = 3600
+    SYNC_HORIZON_WARN_SECONDS: int = 60  # log when an open transaction holds back sync this long
+    
+    # Usage rollups (see app/services/usage_rollups.py)
+    USAGE_ROLLUP_INTERVAL_SECONDS: int = 60
+    USAGE_ROLLUP_LATENESS_SECONDS: int = 300  # clock skew margin; rows younger than this wait for the next run
+    USAGE_ROLLUP_MAX_WINDOW_HOURS: int = 24  # per run, bounds the initial backfill
+    
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # or "text"
+    LOG_QUEUE_SIZE: int = 10000  # records beyond this are dropped, never blocking
+    LOG_RATE_LIMIT_BURST: int = 10  # warnings per call site per window
+    LOG_RATE_LIMIT_WINDOW_SECONDS: float = 60.0
+    ACCESS_LOG_SAMPLE_RATE: float = 0.1  # errors and slow requests are always logged
+    ACCESS_LOG_SLOW_MS: float = 1000.0
+    
+    # Profiling (X-Profile: 1 header, or a sample of all requests)
+    PROFILING_ENABLED: bool = False
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_INTERVAL_MS: float = 5.0
+    PROFILE_BUFFER_SIZE: int = 100
+    QUERY_BUDGET_STRICT: bool = False  # raise instead of warn; enable in tests
+    ADMIN_EMAILS: list = []
     
     class Config:
         env_file = ".env"
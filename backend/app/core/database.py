@@ -1,11 +1,19 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import logging
+import threading
+import time
+from fastapi import Request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.orm import sessionmaker, Session
+import redis
+
 from app.core.config import settings
+from app.core.cache import get_redis, redis_failed
 from app.models.base import Base
 
-# Create SQLAlchemy engine
-engine = create_engine(
-    settings.DATABASE_URL,
+logger = logging.getLogger("alphalabs.database")
+
+ENGINE_OPTIONS = dict(
     pool_size=20,
     max_overflow=20,
     pool_timeout=30,
@@ -13,13 +21,155 @@ engine = create_engine(
     pool_pre_ping=True
 )
 
+# Create SQLAlchemy engine
+engine = create_engine(settings.DATABASE_URL, **ENGINE_OPTIONS)
+
+# Optional read replica for GET requests
+replica_engine = create_engine(settings.DATABASE_REPLICA_URL, **ENGINE_OPTIONS) if settings.DATABASE_REPLICA_URL else None
+
+READ_METHODS = {"GET", "HEAD"}
+
+_replica_down_until = 0.0
+
+
+def replica_available() -> bool:
+    return replica_engine is not None and time.monotonic() >= _replica_down_until
+
+
+def _mark_replica_down(error):
+    global _replica_down_until
+    _replica_down_until = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+    logger.warning(f"Read replica unavailable, using primary for {settings.REPLICA_RETRY_SECONDS}s: {error}")
+
+
+if replica_engine is not None:
+    @event.listens_for(replica_engine, "handle_error")
+    def _on_replica_error(context):
+        if context.is_disconnect or context.connection is None:
+            _mark_replica_down(context.original_exception)
+
+
+def check_replica():
+    """Periodic health probe so reads move back to the replica once it recovers"""
+    global _replica_down_until
+    if replica_engine is None:
+        return
+    try:
+        with replica_engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        _replica_down_until = 0.0
+    except Exception as e:
+        _mark_replica_down(e)
+
+
+# Read-your-writes: after a user writes, their reads stay on the primary for
+# REPLICA_STICKY_SECONDS. Markers live in Redis so every worker sees them;
+# without Redis each process falls back to its own markers.
+_local_markers = {}
+_local_markers_lock = threading.Lock()
+
+
+def _sticky_key(user_id: int) -> str:
+    return f"dbsticky:{user_id}"
+
+
+def mark_recent_write(user_id: int):
+    with _local_markers_lock:
+        _local_markers[user_id] = time.monotonic() + settings.REPLICA_STICKY_SECONDS
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        client.set(_sticky_key(user_id), 1, ex=settings.REPLICA_STICKY_SECONDS)
+    except redis.RedisError as e:
+        redis_failed(e)
+
+
+def has_recent_write(user_id: int) -> bool:
+    with _local_markers_lock:
+        if _local_markers.get(user_id, 0) > time.monotonic():
+            return True
+    client = get_redis()
+    if client is None:
+        return False
+    try:
+        return bool(client.exists(_sticky_key(user_id)))
+    except redis.RedisError as e:
+        redis_failed(e)
+        # Can't tell, so take the safe path
+        return True
+
+
+class RoutingSession(Session):
+    """Session that reads from the replica while `info["use_replica"]` is set; writes always go to the primary"""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.info.get("use_replica") and not self._flushing and replica_available():
+            return replica_engine
+        return super().get_bind(mapper, clause=clause, **kw)
+
+    def execute(self, statement, *args, **kw):
+        if not (self.info.get("use_replica") and replica_available()):
+            return super().execute(statement, *args, **kw)
+        try:
+            return super().execute(statement, *args, **kw)
+        except DBAPIError as e:
+            if not (e.connection_invalidated or isinstance(e, OperationalError)):
+                raise
+            # The replica failed mid-request; a replica session has not written,
+            # so drop its connection and answer this read from the primary
+            logger.warning(f"Replica read failed, retrying on primary: {e.orig}")
+            self.rollback()
+            self.info["use_replica"] = False
+            return super().execute(statement, *args, **kw)
+
+
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
+
+
+def _wrote(session: Session):
+    session.info["wrote"] = True
+    # Anything this session reads from now on must see its own writes
+    session.info["use_replica"] = False
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _after_flush(session, flush_context):
+    _wrote(session)
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _on_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _wrote(orm_execute_state.session)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _after_commit(session):
+    if session.info.pop("wrote", False) and session.info.get("user_id") is not None:
+        mark_recent_write(session.info["user_id"])
+
+
+def set_session_user(db: Session, user_id: int):
+    """Attach the acting user; pins the session to the primary if they wrote recently"""
+    db.info["user_id"] = user_id
+    if db.info.get("use_replica") and has_recent_write(user_id):
+        db.info["use_replica"] = False
+
+
+def reads_from_primary(db: Session) -> bool:
+    """Whether the session's reads currently go to the primary"""
+    return not (db.info.get("use_replica") and replica_available())
+
 
 # Dependency for database sessions
-def get_db():
+def get_db(request: Request):
     db = SessionLocal()
+    # Read-only requests go to the replica (until the user turns out to have written recently)
+    if request.method in READ_METHODS and replica_available():
+        db.info["use_replica"] = True
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
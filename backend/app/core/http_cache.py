@@ -0,0 +1,69 @@
+"""
+Conditional GET helpers for list endpoints.
+
+Lists carry one of two kinds of ETag:
+
+- a version ETag from the per-user counters in app/services/list_versions.py,
+  checked before the list query so a 304 costs no database work. It is only
+  used when the request reads from the primary: a lagging replica could
+  return rows older than the version, and clients would keep that stale body
+  under the new ETag.
+- otherwise (replica reads, Redis unavailable) an ETag derived from the body
+  itself, so a 304 saves the transfer but not the query.
+"""
+
+import hashlib
+import json
+from typing import List, Optional
+from fastapi import Request, Response, status
+
+
+def make_etag(*parts) -> str:
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison: ignore W/ prefixes on both sides
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+def not_modified(request: Request, etag: Optional[str]) -> Optional[Response]:
+    """A 304 response if the client's copy is current, otherwise None"""
+    if etag and etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag))
+    return None
+
+
+def cache_headers(etag: Optional[str]) -> dict:
+    headers = {"Cache-Control": "private, no-cache"}
+    if etag:
+        headers["ETag"] = etag
+    return headers
+
+
+def content_etag(scope: str, body: List) -> str:
+    digest = hashlib.blake2b(json.dumps(body, default=str, sort_keys=True).encode(), digest_size=12).hexdigest()
+    return make_etag(scope, digest)
+
+
+def list_response(request: Request, response: Response, etag: Optional[str], scope: str, body: List):
+    """Return a list body with its ETag, falling back to a content ETag when there is no version ETag"""
+    if etag is None:
+        etag = content_etag(scope, body)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+    response.headers.update(cache_headers(etag))
+    return body
@@ -0,0 +1,293 @@
+"""
+On-demand request profiling and query budgets.
+
+A request is profiled when it sends `X-Profile: 1` (only honoured while
+PROFILING_ENABLED is set) or is picked at PROFILE_SAMPLE_RATE. A profile
+records:
+
+- a sampling CPU profile: a background thread snapshots the stack of the
+  thread serving the request every PROFILE_INTERVAL_MS. For async handlers
+  that is the event loop thread, so samples can include other requests
+  running concurrently on the loop.
+- every SQL statement (count and time, grouped by statement text).
+- named timers such as `bcrypt` (see `timed`).
+
+Finished profiles are kept in a per-process ring buffer of
+PROFILE_BUFFER_SIZE entries and served by /api/admin/profiles.
+
+`query_budget` declares how many SQL statements an endpoint may run; with
+QUERY_BUDGET_STRICT (tests) exceeding it raises, otherwise it logs a warning.
+`assert_max_queries` is the equivalent guard for test code.
+"""
+
+import functools
+import logging
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.log import request_id_var
+
+logger = logging.getLogger("alphalabs.profiling")
+
+PROFILE_HEADER = b"x-profile"
+MAX_STACK_DEPTH = 64
+MAX_STACKS = 50
+MAX_STATEMENTS = 50
+
+
+class Profile:
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex
+        self.request_id = request_id_var.get()
+        self.method = method
+        self.path = path
+        self.started_on = datetime.utcnow()
+        self.duration_ms = 0.0
+        self.status: Optional[int] = None
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.statements: Dict[str, List[float]] = {}  # statement -> [count, total ms]
+        self.timers: Dict[str, List[float]] = {}  # name -> [count, total ms]
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    def add_statement(self, statement: str, elapsed_ms: float):
+        with self._lock:
+            self.sql_count += 1
+            self.sql_ms += elapsed_ms
+            entry = self.statements.setdefault(statement, [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed_ms
+
+    def add_timer(self, name: str, elapsed_ms: float):
+        with self._lock:
+            entry = self.timers.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed_ms
+
+    def add_sample(self, stack: str):
+        with self._lock:
+            self.stacks[stack] += 1
+            self.samples += 1
+
+    def summary(self) -> Dict:
+        with self._lock:
+            timers = dict(self.timers)
+        return {
+            "id": self.id,
+            "request_id": self.request_id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_on": self.started_on,
+            "duration_ms": round(self.duration_ms, 2),
+            "sql_count": self.sql_count,
+            "sql_ms": round(self.sql_ms, 2),
+            "timers": {name: {"count": c, "ms": round(ms, 2)} for name, (c, ms) in timers.items()},
+        }
+
+    def detail(self) -> Dict:
+        # The sampler may still be adding to these while the request runs
+        with self._lock:
+            statements = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)
+            stacks = self.stacks.most_common(MAX_STACKS)
+            samples = self.samples
+        return {
+            **self.summary(),
+            "samples": samples,
+            "interval_ms": settings.PROFILE_INTERVAL_MS,
+            "statements": [
+                {"statement": statement, "count": c, "ms": round(ms, 2)}
+                for statement, (c, ms) in statements[:MAX_STATEMENTS]
+            ],
+            # Collapsed stacks, root first; feed into flamegraph.pl or speedscope
+            "stacks": [
+                {"stack": stack, "samples": count}
+                for stack, count in stacks
+            ],
+        }
+
+
+current_profile: ContextVar[Optional[Profile]] = ContextVar("current_profile", default=None)
+_query_counters: ContextVar[tuple] = ContextVar("query_counters", default=())
+
+_profiles: deque = deque(maxlen=settings.PROFILE_BUFFER_SIZE)
+_profiles_lock = threading.Lock()
+
+
+def recent_profiles() -> List[Profile]:
+    with _profiles_lock:
+        return list(reversed(_profiles))
+
+
+def get_profile(profile_id: str) -> Optional[Profile]:
+    with _profiles_lock:
+        return next((p for p in _profiles if p.id == profile_id), None)
+
+
+# SQL statements, on every engine (primary and replica)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_profile.get() is not None or _query_counters.get():
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+    profile = current_profile.get()
+    if profile is not None:
+        profile.add_statement(statement, elapsed_ms)
+    for counter in _query_counters.get():
+        counter.append(statement)
+
+
+@contextmanager
+def timed(name: str):
+    """Add the time spent in the block to the current profile under `name`"""
+    profile = current_profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_timer(name, (time.perf_counter() - start) * 1000)
+
+
+# Sampling CPU profiler
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, profile: Profile, thread_id: int):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.profile = profile
+        self.thread_id = thread_id
+        self.interval = settings.PROFILE_INTERVAL_MS / 1000
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.profile.add_sample(_collapse(frame))
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _wants_profile(scope) -> bool:
+    if settings.PROFILING_ENABLED and dict(scope["headers"]).get(PROFILE_HEADER) in (b"1", b"true"):
+        return True
+    return settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware that profiles selected HTTP requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wants_profile(scope):
+            return await self.app(scope, receive, send)
+
+        profile = Profile(scope["method"], scope["path"])
+        token = current_profile.set(profile)
+        sampler = _Sampler(profile, threading.get_ident())
+        sampler.start()
+        start = time.perf_counter()
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profile.duration_ms = (time.perf_counter() - start) * 1000
+            sampler.stop()
+            current_profile.reset(token)
+            with _profiles_lock:
+                _profiles.append(profile)
+            logger.info(
+                f"Profiled {profile.method} {profile.path}",
+                extra={"profile_id": profile.id, "duration_ms": round(profile.duration_ms, 1), "sql_count": profile.sql_count},
+            )
+
+
+# Query budgets
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def count_queries():
+    """Collect the SQL statements run inside the block (on this task/thread)"""
+    statements: List[str] = []
+    token = _query_counters.set(_query_counters.get() + (statements,))
+    try:
+        yield statements
+    finally:
+        _query_counters.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int):
+    """Test helper: fail if the block runs more than `limit` SQL statements"""
+    with count_queries() as statements:
+        yield statements
+    if len(statements) > limit:
+        raise QueryBudgetExceeded(
+            f"{len(statements)} queries, budget {limit}:\n" + "\n".join(statements)
+        )
+
+
+def query_budget(limit: int):
+    """
+    Declare the most SQL statements an endpoint's handler may run (dependencies
+    such as authentication are not counted).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with count_queries() as statements:
+                result = await func(*args, **kwargs)
+            if len(statements) > limit:
+                message = f"{func.__name__} ran {len(statements)} queries, budget {limit}"
+                if settings.QUERY_BUDGET_STRICT:
+                    raise QueryBudgetExceeded(message + ":\n" + "\n".join(statements))
+                logger.warning(message)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,108 @@
+"""
+Idempotent schema upgrades for databases created before a model change.
+
+`Base.metadata.create_all` only creates missing tables, so new nullable
+columns, constraint and index changes on existing tables are applied here on
+startup.
+"""
+
+import logging
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.models.base import Base
+
+logger = logging.getLogger("alphalabs.schema")
+
+# (table, constraint, column, referenced table) foreign keys that cascade in the database
+CASCADE_FOREIGN_KEYS = [
+    ("user_chats", "user_chats_user_id_fkey", "user_id", "users"),
+    ("chat_messages", "chat_messages_user_chat_id_fkey", "user_chat_id", "user_chats"),
+    ("chat_messages", "chat_messages_user_id_fkey", "user_id", "users"),
+]
+
+
+def _ensure_cascade_foreign_keys(conn):
+    for table, constraint, column, referenced in CASCADE_FOREIGN_KEYS:
+        # NOT VALID skips re-checking existing rows, they already satisfy the old
+        # constraint. Partitioned tables (chat_messages) reject NOT VALID foreign
+        # keys, so there the rows are validated as part of the ALTER.
+        conn.execute(text(f"""
+            DO $$
+            BEGIN
+                IF EXISTS (
+                    SELECT 1 FROM pg_constraint
+                    WHERE conname = '{constraint}'
+                      AND conrelid = '{table}'::regclass
+                      AND confdeltype <> 'c'
+                ) THEN
+                    ALTER TABLE {table} DROP CONSTRAINT {constraint};
+                    IF (SELECT relkind FROM pg_class WHERE oid = '{table}'::regclass) = 'p' THEN
+                        ALTER TABLE {table} ADD CONSTRAINT {constraint}
+                            FOREIGN KEY ({column}) REFERENCES {referenced} (id)
+                            ON DELETE CASCADE;
+                    ELSE
+                        ALTER TABLE {table} ADD CONSTRAINT {constraint}
+                            FOREIGN KEY ({column}) REFERENCES {referenced} (id)
+                            ON DELETE CASCADE NOT VALID;
+                    END IF;
+                END IF;
+            END $$;
+        """))
+
+
+def _ensure_columns(conn):
+    # Only nullable columns can be added without a backfill
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN IF NOT EXISTS {column.name} {column_type}"))
+
+
+def _ensure_indexes(conn):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+
+
+def _configure_archive_storage(conn):
+    # Archived messages are rarely read: compress large values and push them
+    # out of line sooner than the default ~2KB TOAST threshold
+    conn.execute(text("ALTER TABLE chat_messages_archive SET (toast_tuple_target = 128)"))
+    try:
+        with conn.begin_nested():
+            for column in ("prompt", "response", "source", "rating", "context"):
+                conn.execute(text(
+                    f"ALTER TABLE chat_messages_archive ALTER COLUMN {column} "
+                    f"SET COMPRESSION {settings.CHAT_ARCHIVE_COMPRESSION}"
+                ))
+    except Exception as e:
+        logger.warning(f"Could not set archive compression: {e}")
+
+    tablespace = settings.CHAT_ARCHIVE_TABLESPACE
+    if tablespace:
+        current = conn.execute(text(
+            "SELECT tablespace FROM pg_tables WHERE tablename = 'chat_messages_archive'"
+        )).scalar()
+        if current != tablespace:
+            conn.execute(text(f'ALTER TABLE chat_messages_archive SET TABLESPACE "{tablespace}"'))
+
+
+def upgrade_schema(engine: Engine):
+    """Bring an existing database in line with the current models"""
+    if engine.dialect.name != "postgresql":
+        return
+
+    with engine.begin() as conn:
+        _ensure_cascade_foreign_keys(conn)
+        _ensure_columns(conn)
+        _ensure_indexes(conn)
+        _configure_archive_storage(conn)
+    logger.info("Schema upgrades applied")
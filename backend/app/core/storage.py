@@ -0,0 +1,258 @@
+"""
+Document storage backends.
+
+Uploaded files and image variants are addressed by a storage key (a flat file
+name such as `<uuid>.pdf`) that is stored in `Document.file_path`.
+
+- `local` keeps files under UPLOAD_DIR, served by the `/uploads` static mount.
+- `s3` keeps them in an S3-compatible bucket (AWS S3, or MinIO locally).
+  Clients upload with presigned POSTs and download through short-lived
+  presigned URLs, so file bytes never pass through the API. Files the API
+  writes itself (legacy uploads, image variants) use parallel multipart
+  transfers.
+
+Rows written before storage keys existed hold paths like `uploads/<name>`;
+`storage_key` maps them onto the same key.
+"""
+
+import abc
+import logging
+import os
+import shutil
+from typing import BinaryIO, Dict, Iterator, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger("alphalabs.storage")
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def storage_key(file_path: str) -> str:
+    """Storage key for a `Document.file_path` value, including legacy local paths"""
+    prefix = settings.UPLOAD_DIR.rstrip("/") + "/"
+    if file_path.startswith(prefix):
+        return file_path[len(prefix):]
+    return file_path
+
+
+class Storage(abc.ABC):
+    @abc.abstractmethod
+    def save(self, key: str, fileobj: BinaryIO, content_type: Optional[str] = None) -> int:
+        """Store a readable file object under `key`; returns the number of bytes"""
+
+    @abc.abstractmethod
+    def save_file(self, key: str, path: str, content_type: Optional[str] = None):
+        """Store a local file under `key`; the file may be moved"""
+
+    @abc.abstractmethod
+    def download(self, key: str, path: str):
+        """Copy the object to a local file"""
+
+    @abc.abstractmethod
+    def open(self, key: str) -> Iterator[bytes]:
+        """Stream the object in chunks"""
+
+    @abc.abstractmethod
+    def delete(self, key: str):
+        """Remove the object; missing objects are ignored"""
+
+    @abc.abstractmethod
+    def size(self, key: str) -> Optional[int]:
+        """Size of the object in bytes, or None if it does not exist"""
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Filesystem path of the object, for backends that have one"""
+        return None
+
+    def public_url(self, key: str) -> Optional[str]:
+        """Stable URL clients can fetch without credentials, if the backend has one"""
+        return None
+
+    def presigned_url(self, key: str, filename: Optional[str] = None, content_type: Optional[str] = None) -> Optional[str]:
+        """Short-lived download URL, if the backend can issue one"""
+        return None
+
+    def presigned_upload(self, key: str, content_type: str, max_size: int) -> Optional[Dict]:
+        """
+        Short-lived form upload straight to the backend: `{"url", "fields"}`
+        for a multipart POST, if the backend can issue one
+        """
+        return None
+
+
+class LocalStorage(Storage):
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        # Never follow a key outside the upload directory
+        root = os.path.realpath(self.root)
+        path = os.path.realpath(os.path.join(root, key))
+        if os.path.commonpath([root, path]) != root:
+            raise ValueError(f"Storage key outside upload dir: {key}")
+        return path
+
+    def save(self, key, fileobj, content_type=None):
+        size = 0
+        with open(self._path(key), "wb") as out:
+            while True:
+                chunk = fileobj.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                out.write(chunk)
+                size += len(chunk)
+        return size
+
+    def save_file(self, key, path, content_type=None):
+        shutil.move(path, self._path(key))
+
+    def download(self, key, path):
+        shutil.copyfile(self._path(key), path)
+
+    def open(self, key):
+        with open(self._path(key), "rb") as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def size(self, key):
+        try:
+            return os.path.getsize(self._path(key))
+        except FileNotFoundError:
+            return None
+
+    def local_path(self, key):
+        return self._path(key)
+
+    def public_url(self, key):
+        return f"/uploads/{key}"
+
+
+class S3Storage(Storage):
+    def __init__(self):
+        # Only needed for this backend
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+        from botocore.exceptions import ClientError
+
+        self._client_error = ClientError
+        self.bucket = settings.S3_BUCKET
+        credentials = dict(
+            region_name=settings.S3_REGION,
+            aws_access_key_id=settings.S3_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+            # Path-style addressing works for MinIO and other S3-compatible stores
+            config=Config(
+                signature_version="s3v4",
+                s3={"addressing_style": "path"},
+                max_pool_connections=max(10, settings.S3_MAX_CONCURRENCY * 2),
+            ),
+        )
+        self.client = boto3.client("s3", endpoint_url=settings.S3_ENDPOINT_URL, **credentials)
+        # Presigned URLs must use a host the mobile client can reach
+        public_endpoint = settings.S3_PUBLIC_ENDPOINT_URL or settings.S3_ENDPOINT_URL
+        self.presign_client = (
+            boto3.client("s3", endpoint_url=public_endpoint, **credentials)
+            if public_endpoint != settings.S3_ENDPOINT_URL else self.client
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=settings.S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=settings.S3_MULTIPART_CHUNK_SIZE,
+            max_concurrency=settings.S3_MAX_CONCURRENCY,
+            use_threads=True,
+        )
+
+    def ensure_bucket(self):
+        try:
+            self.client.head_bucket(Bucket=self.bucket)
+        except self._client_error:
+            self.client.create_bucket(Bucket=self.bucket)
+            logger.info(f"Created bucket {self.bucket}")
+
+    def _extra_args(self, content_type):
+        return {"ContentType": content_type} if content_type else None
+
+    def save(self, key, fileobj, content_type=None):
+        fileobj.seek(0, os.SEEK_END)
+        size = fileobj.tell()
+        fileobj.seek(0)
+        self.client.upload_fileobj(
+            fileobj, self.bucket, key,
+            ExtraArgs=self._extra_args(content_type),
+            Config=self.transfer_config,
+        )
+        return size
+
+    def save_file(self, key, path, content_type=None):
+        self.client.upload_file(
+            path, self.bucket, key,
+            ExtraArgs=self._extra_args(content_type),
+            Config=self.transfer_config,
+        )
+
+    def download(self, key, path):
+        # Ranged GETs in parallel for large objects
+        self.client.download_file(self.bucket, key, path, Config=self.transfer_config)
+
+    def open(self, key):
+        body = self.client.get_object(Bucket=self.bucket, Key=key)["Body"]
+        try:
+            yield from body.iter_chunks(CHUNK_SIZE)
+        finally:
+            body.close()
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def size(self, key):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)["ContentLength"]
+        except self._client_error as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def presigned_upload(self, key, content_type, max_size):
+        # The conditions are enforced by the store, so the size limit holds
+        # even though the API never sees the bytes
+        return self.presign_client.generate_presigned_post(
+            self.bucket, key,
+            Fields={"Content-Type": content_type},
+            Conditions=[{"Content-Type": content_type}, ["content-length-range", 1, max_size]],
+            ExpiresIn=settings.S3_PRESIGN_EXPIRES_SECONDS,
+        )
+
+    def presigned_url(self, key, filename=None, content_type=None):
+        params = {"Bucket": self.bucket, "Key": key}
+        if filename:
+            safe_name = filename.replace('"', "")
+            params["ResponseContentDisposition"] = f'inline; filename="{safe_name}"'
+        if content_type:
+            params["ResponseContentType"] = content_type
+        return self.presign_client.generate_presigned_url(
+            "get_object", Params=params, ExpiresIn=settings.S3_PRESIGN_EXPIRES_SECONDS
+        )
+
+
+_storage: Optional[Storage] = None
+
+
+def get_storage() -> Storage:
+    global _storage
+    if _storage is None:
+        if settings.STORAGE_BACKEND == "s3":
+            _storage = S3Storage()
+        else:
+            _storage = LocalStorage(settings.UPLOAD_DIR)
+    return _storage
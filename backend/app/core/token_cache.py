@@ -0,0 +1,59 @@
+"""
+Per-process cache of verified bearer tokens.
+
+Maps the SHA-256 digest of a token to the claims it decoded to, so a client
+sending the same token on every request pays for one signature check and
+claim validation instead of one per request. Entries are only served until
+the token's `exp`; revocation is checked separately on every request.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of token digest -> (expiry, claims)"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self._digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, token: str, claims: Dict[str, Any]):
+        # Tokens without an expiry are never cached
+        if self.max_size <= 0 or not isinstance(claims.get("exp"), (int, float)):
+            return
+        key = self._digest(token)
+        with self._lock:
+            self._entries[key] = (claims["exp"], claims)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = VerifiedTokenCache(settings.TOKEN_CACHE_SIZE)
@@ -3,7 +3,10 @@ from .user import User
 from .client import Client
 from .user_chat import UserChat
 from .chat_message import ChatMessage
+from .chat_message_archive import ChatMessageArchive
 from .document import Document
+from .sync_change import SyncChange
+from .usage import UsageDaily, RollupWatermark
 
 # Import all models to ensure they are registered with SQLAlchemy
 __all__ = [
@@ -13,5 +16,9 @@ __all__ = [
     "Client",
     "UserChat",
     "ChatMessage",
-    "Document"
+    "ChatMessageArchive",
+    "Document",
+    "SyncChange",
+    "UsageDaily",
+    "RollupWatermark"
 ] 
\ No newline at end of file
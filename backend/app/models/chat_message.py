@@ -1,13 +1,27 @@
-from sqlalchemy import Column, Integer, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, ForeignKey, Text, JSON, DateTime, Index
 from sqlalchemy.orm import relationship
+from datetime import datetime
 from .base import Base, TimestampMixin
 
 class ChatMessage(Base, TimestampMixin):
     __tablename__ = 'chat_messages'
+    # Monthly range partitions on created_on, managed by app/services/partitions.py
+    __table_args__ = (
+        # History reads and latest-activity lookups per chat
+        Index('ix_chat_messages_chat_created', 'user_chat_id', 'created_on'),
+        # Time-range scans for usage rollups; BRIN suits append-only timestamps and stays tiny
+        Index('ix_chat_messages_created_brin', 'created_on', postgresql_using='brin'),
+        {'postgresql_partition_by': 'RANGE (created_on)'},
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    user_chat_id = Column(Integer, ForeignKey('user_chats.id'), nullable=False, index=True)
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    # Partition key has to be part of the primary key on a partitioned table.
+    # PostgreSQL still fills id from its sequence with this composite key, but
+    # SQLite only autoincrements a single-column INTEGER PRIMARY KEY, so on
+    # SQLite ids must be assigned on insert (tests/conftest.py does that).
+    created_on = Column(DateTime, default=datetime.utcnow, nullable=False, primary_key=True)
+    user_chat_id = Column(Integer, ForeignKey('user_chats.id', ondelete='CASCADE'), nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
     client_id = Column(Integer, ForeignKey('clients.id'), nullable=False, index=True)
     prompt = Column(Text, nullable=False)
     response = Column(Text, nullable=False)
@@ -22,4 +36,4 @@ class ChatMessage(Base, TimestampMixin):
     client = relationship("Client")
 
     def __repr__(self):
-        return f"<ChatMessage(id={self.id}, user_chat_id={self.user_chat_id})>" 
\ No newline at end of file
+        return f"<ChatMessage(id={self.id}, user_chat_id={self.user_chat_id})>"
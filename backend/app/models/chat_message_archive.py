@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, ForeignKey, Text, JSON
+from .base import Base, TimestampMixin
+
+class ChatMessageArchive(Base, TimestampMixin):
+    """Cold storage for chat_messages partitions past the archive age"""
+    __tablename__ = 'chat_messages_archive'
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_chat_id = Column(Integer, ForeignKey('user_chats.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    client_id = Column(Integer, ForeignKey('clients.id'), nullable=False, index=True)
+    prompt = Column(Text, nullable=False)
+    response = Column(Text, nullable=False)
+    source = Column(JSON, nullable=True)
+    rating = Column(JSON, nullable=True)
+    context = Column(JSON, nullable=True)
+    is_voice = Column(Integer, default=0, nullable=False)  # 0 = text, 1 = voice
+
+    def __repr__(self):
+        return f"<ChatMessageArchive(id={self.id}, user_chat_id={self.user_chat_id})>"
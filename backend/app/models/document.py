@@ -1,9 +1,19 @@
-from sqlalchemy import Column, Integer, ForeignKey, String, BigInteger, Boolean
+from sqlalchemy import Column, Integer, ForeignKey, String, BigInteger, Boolean, Index, JSON, text
 from sqlalchemy.orm import relationship
 from .base import Base, TimestampMixin
 
 class Document(Base, TimestampMixin):
     __tablename__ = 'documents'
+    __table_args__ = (
+        # Live documents per uploader, newest first (the document list query)
+        Index('ix_documents_uploader_live', 'uploaded_by', 'created_on', postgresql_where=text('NOT is_deleted')),
+        # Soft-deleted documents waiting for the reaper
+        Index('ix_documents_deleted', 'id', postgresql_where=text('is_deleted')),
+        # Time-range scans for usage rollups
+        Index('ix_documents_created_brin', 'created_on', postgresql_using='brin'),
+        # One document per stored file; completing a direct upload twice can't duplicate it
+        Index('ux_documents_file_path', 'file_path', unique=True),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     client_id = Column(Integer, ForeignKey('clients.id'), nullable=False, index=True)
@@ -14,6 +24,8 @@ class Document(Base, TimestampMixin):
     mime_type = Column(String(100), nullable=True)
     is_deleted = Column(Boolean, default=False, nullable=False)
     uploaded_by = Column(Integer, ForeignKey('users.id'), nullable=True, index=True)
+    variants = Column(JSON, nullable=True)  # resized copies of images, see app/services/image_variants.py
+    placeholder = Column(String(64), nullable=True)  # BlurHash of images
 
     # Relationships
     client = relationship("Client", back_populates="documents")
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, Index, DDL, event, text
+from .base import Base, TimestampMixin
+
+class SyncChange(Base, TimestampMixin):
+    """Change log behind GET /api/sync; one row per created/updated/deleted entity"""
+    __tablename__ = 'sync_changes'
+    __table_args__ = (
+        Index('ix_sync_changes_user_txid', 'user_id', 'txid', 'id'),
+        Index('ix_sync_changes_created', 'created_on'),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    entity = Column(String(16), nullable=False)  # chat, message, document
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String(8), nullable=False)  # upsert, delete
+    # Writing transaction's id; PostgreSQL fills it in (see below)
+    txid = Column(BigInteger, nullable=False, server_default=text("0"))
+
+    def __repr__(self):
+        return f"<SyncChange(id={self.id}, entity={self.entity}, entity_id={self.entity_id}, op={self.op})>"
+
+# Sync cursors are ordered by transaction id rather than row id, which is only
+# safe on PostgreSQL where txid_current() is available
+event.listen(
+    SyncChange.__table__,
+    "after_create",
+    DDL("ALTER TABLE sync_changes ALTER COLUMN txid SET DEFAULT txid_current()").execute_if(dialect="postgresql"),
+)
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Date, DateTime
+from datetime import datetime
+from .base import Base
+
+class UsageDaily(Base):
+    """Per-day usage per client and user, maintained by app/services/usage_rollups.py"""
+    __tablename__ = 'usage_daily'
+
+    day = Column(Date, primary_key=True)
+    client_id = Column(Integer, primary_key=True)
+    # No foreign keys: usage history outlives deleted users and clients
+    user_id = Column(Integer, primary_key=True)  # 0 = documents without an uploader
+    messages = Column(Integer, default=0, nullable=False)
+    voice_messages = Column(Integer, default=0, nullable=False)
+    documents = Column(Integer, default=0, nullable=False)
+    document_bytes = Column(BigInteger, default=0, nullable=False)
+    updated_on = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<UsageDaily(day={self.day}, client_id={self.client_id}, user_id={self.user_id})>"
+
+class RollupWatermark(Base):
+    """How far a rollup has consumed its source rows (by created_on)"""
+    __tablename__ = 'rollup_watermarks'
+
+    name = Column(String(63), primary_key=True)
+    watermark = Column(DateTime, nullable=False)
+    updated_on = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<RollupWatermark(name={self.name}, watermark={self.watermark})>"
@@ -13,7 +13,7 @@ class User(Base, TimestampMixin):
     is_verified = Column(Boolean, default=False, nullable=False)
 
     # Relationships
-    chats = relationship("UserChat", back_populates="user", cascade="all, delete-orphan")
+    chats = relationship("UserChat", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
     documents = relationship("Document", back_populates="uploader")
 
     def __repr__(self):
@@ -1,9 +1,12 @@
-from .auth import UserCreate, UserLogin, Token, TokenData, UserResponse
-from .chat import ChatCreate, ChatResponse, ChatMessageCreate, ChatMessageResponse
-from .document import DocumentCreate, DocumentResponse
+from .auth import UserCreate, UserLogin, Token, TokenData, UserResponse, SessionResponse
+from .chat import ChatCreate, ChatResponse, ChatMessageCreate, ChatMessageResponse, ChatJobResponse
+from .document import DocumentCreate, DocumentResponse, DocumentVariantResponse, DirectUploadCreate, DirectUploadResponse, DirectUploadComplete
+from .sync import SyncResponse, SyncMessageResponse, SyncDeleted
 
 __all__ = [
-    "UserCreate", "UserLogin", "Token", "TokenData", "UserResponse",
-    "ChatCreate", "ChatResponse", "ChatMessageCreate", "ChatMessageResponse",
-    "DocumentCreate", "DocumentResponse"
+    "UserCreate", "UserLogin", "Token", "TokenData", "UserResponse", "SessionResponse",
+    "ChatCreate", "ChatResponse", "ChatMessageCreate", "ChatMessageResponse", "ChatJobResponse",
+    "DocumentCreate", "DocumentResponse", "DocumentVariantResponse",
+    "DirectUploadCreate", "DirectUploadResponse", "DirectUploadComplete",
+    "SyncResponse", "SyncMessageResponse", "SyncDeleted"
 ] 
\ No newline at end of file
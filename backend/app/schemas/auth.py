@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from typing import Optional, Dict, Any
+from datetime import datetime
 
 class UserCreate(BaseModel):
     email: EmailStr
@@ -34,4 +35,13 @@ class SigninRequest(BaseModel):
 class SigninResponse(BaseModel):
     token: Optional[str] = None
     user: Optional[UserResponse] = None
-    issuer: Optional[Dict[str, Any]] = None 
\ No newline at end of file
+    issuer: Optional[Dict[str, Any]] = None
+
+class SessionResponse(BaseModel):
+    jti: str
+    client_id: Optional[int] = None
+    issued_at: datetime
+    expires_at: datetime
+    user_agent: Optional[str] = None
+    ip: Optional[str] = None
+    current: bool = False
@@ -27,4 +27,11 @@ class ChatMessageResponse(BaseModel):
     created_on: datetime
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class ChatJobResponse(BaseModel):
+    job_id: str
+    status: str
+    chat_id: int
+    result: Optional[ChatMessageResponse] = None
+    error: Optional[str] = None
@@ -1,10 +1,18 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List, Dict
 from datetime import datetime
 
 class DocumentCreate(BaseModel):
     title: Optional[str] = None
 
+class DocumentVariantResponse(BaseModel):
+    name: str
+    url: str
+    width: int
+    height: int
+    file_size: int
+    mime_type: str
+
 class DocumentResponse(BaseModel):
     id: int
     title: str
@@ -13,6 +21,24 @@ class DocumentResponse(BaseModel):
     mime_type: Optional[str] = None
     uploaded_by: Optional[int] = None
     created_on: datetime
+    url: Optional[str] = None
+    placeholder: Optional[str] = None
+    variants: List[DocumentVariantResponse] = []
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+
+class DirectUploadCreate(BaseModel):
+    filename: str
+    mime_type: str
+    title: Optional[str] = None
+
+class DirectUploadResponse(BaseModel):
+    upload_token: str
+    url: str
+    fields: Dict[str, str]
+    expires_in: int
+
+class DirectUploadComplete(BaseModel):
+    upload_token: str
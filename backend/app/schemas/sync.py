@@ -0,0 +1,24 @@
+from pydantic import BaseModel
+from typing import List
+from datetime import datetime
+
+from .chat import ChatResponse, ChatMessageResponse
+from .document import DocumentResponse
+
+class SyncMessageResponse(ChatMessageResponse):
+    chat_id: int
+
+class SyncDeleted(BaseModel):
+    chats: List[int] = []
+    messages: List[int] = []
+    documents: List[int] = []
+
+class SyncResponse(BaseModel):
+    cursor: str
+    has_more: bool = False
+    full_resync: bool = False
+    server_time: datetime
+    chats: List[ChatResponse] = []
+    messages: List[SyncMessageResponse] = []
+    documents: List[DocumentResponse] = []
+    deleted: SyncDeleted = SyncDeleted()
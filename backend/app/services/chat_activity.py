@@ -0,0 +1,91 @@
+"""
+Coalescing write-behind buffer for `UserChat.last_message`.
+
+`send_message` records activity here instead of updating the chat row in the
+message transaction. Pending timestamps are merged per chat and flushed in one
+batch every CHAT_ACTIVITY_FLUSH_SECONDS, so a burst of messages to one chat
+costs a single row update. Readers that need exact ordering fall back to the
+message table for anything newer than the stored value (see `chat_activity_at`).
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import bindparam, func, or_, select
+
+from app.core.database import SessionLocal
+from app.models.chat_message import ChatMessage
+from app.models.user_chat import UserChat
+
+logger = logging.getLogger("alphalabs.chat_activity")
+
+_pending: Dict[int, datetime] = {}
+_lock = threading.Lock()
+
+_user_chats = UserChat.__table__
+_update_last_message = (
+    _user_chats.update()
+    .where(_user_chats.c.id == bindparam("chat_id"))
+    # Never move last_message backwards if another worker flushed a newer value
+    .where(or_(_user_chats.c.last_message.is_(None), _user_chats.c.last_message < bindparam("at")))
+    .values(last_message=bindparam("at"))
+)
+
+
+def _merge(chat_id: int, at: datetime):
+    current = _pending.get(chat_id)
+    if current is None or at > current:
+        _pending[chat_id] = at
+
+
+def touch_chat(chat_id: int, at: Optional[datetime] = None):
+    """Record activity on a chat; persisted on the next flush"""
+    with _lock:
+        _merge(chat_id, at or datetime.utcnow())
+
+
+def flush_chat_activity() -> int:
+    """Write all pending timestamps in one batch; returns the number of chats"""
+    global _pending
+    with _lock:
+        batch, _pending = _pending, {}
+    if not batch:
+        return 0
+
+    db = SessionLocal()
+    try:
+        # Stable order keeps concurrent flushes from different workers deadlock-free
+        db.execute(_update_last_message, [
+            {"chat_id": chat_id, "at": at} for chat_id, at in sorted(batch.items())
+        ])
+        db.commit()
+        return len(batch)
+    except Exception:
+        db.rollback()
+        # Put the batch back so the next flush retries it
+        with _lock:
+            for chat_id, at in batch.items():
+                _merge(chat_id, at)
+        raise
+    finally:
+        db.close()
+
+
+def chat_activity_at():
+    """
+    SQL expression for a chat's latest activity, correct even before a flush.
+
+    Only messages newer than the stored `last_message` are consulted, which is
+    an index probe on (user_chat_id, created_on) that usually finds nothing.
+    """
+    unflushed = (
+        select(func.max(ChatMessage.created_on))
+        .where(
+            ChatMessage.user_chat_id == UserChat.id,
+            ChatMessage.created_on > func.coalesce(UserChat.last_message, UserChat.created_on),
+        )
+        .correlate(UserChat)
+        .scalar_subquery()
+    )
+    return func.coalesce(unflushed, UserChat.last_message)
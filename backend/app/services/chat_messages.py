@@ -0,0 +1,106 @@
+"""
+Reply generation and message persistence shared by the synchronous chat
+endpoint and the chat job workers.
+"""
+
+from typing import Dict, Optional
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal, set_session_user
+from app.models.chat_message import ChatMessage
+from app.models.user_chat import UserChat
+from app.services.chat_activity import touch_chat
+from app.services.conversation_context import build_context, context_record, save_context_state
+from app.services.jobs import JobFailed, job_handler
+from app.services.list_versions import bump_list_version
+from app.services.sync import MESSAGE, record_change
+
+CHAT_REPLY_JOB = "chat.reply"
+
+
+def generate_reply(prompt: str, context: Optional[Dict] = None) -> str:
+    """Answer `prompt`; `context` is the output of build_context for the chat"""
+    # For now, simulate AI response (you can integrate with your AI service later)
+    return f"AI Response to: {prompt}"
+
+
+def record_message(
+    db: Session,
+    chat_id: int,
+    client_id: int,
+    user_id: int,
+    prompt: str,
+    response: str,
+    is_voice: bool = False,
+    context: Optional[Dict] = None,
+) -> ChatMessage:
+    message = ChatMessage(
+        user_chat_id=chat_id,
+        user_id=user_id,
+        client_id=client_id,
+        prompt=prompt,
+        response=response,
+        context=context_record(context),
+        is_voice=1 if is_voice else 0
+    )
+    db.add(message)
+    db.flush()
+    record_change(db, user_id, MESSAGE, message.id)
+    db.commit()
+    db.refresh(message)
+
+    if context is not None:
+        save_context_state(chat_id, context)
+    # Chat last message timestamp is written behind in batches
+    touch_chat(chat_id, message.created_on)
+    bump_list_version(user_id, "chats", f"messages:{chat_id}")
+    return message
+
+
+def message_response(message: ChatMessage) -> Dict:
+    return {
+        "id": message.id,
+        "content": message.prompt,
+        "response": message.response,
+        "is_voice": bool(message.is_voice),
+        "created_on": message.created_on
+    }
+
+
+@job_handler(CHAT_REPLY_JOB)
+def run_chat_reply(payload: Dict) -> Dict:
+    """Generate a reply without holding a DB connection while the model runs"""
+    db = SessionLocal()
+    set_session_user(db, payload["user_id"])
+    try:
+        context = build_context(db, payload["chat_id"], payload["content"])
+        # Return the connection to the pool during generation; the session
+        # checks one out again for the insert
+        db.close()
+        reply = generate_reply(payload["content"], context)
+
+        # The chat may have been deleted while the reply was generated. The key
+        # share lock keeps it from being deleted before the insert commits.
+        chat = db.query(UserChat.id).filter(
+            UserChat.id == payload["chat_id"],
+            UserChat.user_id == payload["user_id"]
+        ).with_for_update(read=True, key_share=True).first()
+        if chat is None:
+            raise JobFailed("Chat deleted")
+
+        message = record_message(
+            db,
+            chat_id=payload["chat_id"],
+            client_id=payload["client_id"],
+            user_id=payload["user_id"],
+            prompt=payload["content"],
+            response=reply,
+            is_voice=payload.get("is_voice", False),
+            context=context,
+        )
+        result = message_response(message)
+    finally:
+        db.close()
+
+    result["created_on"] = result["created_on"].isoformat()
+    return result
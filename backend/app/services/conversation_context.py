@@ -0,0 +1,219 @@
+"""
+Conversation context for a chat turn.
+
+A prompt is built from a rolling summary of older turns plus the most recent
+CONTEXT_RECENT_TURNS turns verbatim, kept within CONTEXT_TOKEN_BUDGET. The
+summary is updated incrementally: each turn only folds in the messages that
+have dropped out of the verbatim window since the last update, so preparing a
+prompt reads a constant number of rows however long the chat gets.
+
+Summary state is recorded in `ChatMessage.context` of every new message and,
+once that message is committed, cached in Redis. On a cache miss it is
+recovered from the newest message.
+"""
+
+import json
+import re
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import redis
+from sqlalchemy.orm import Session
+
+from app.core.cache import get_redis, redis_failed
+from app.core.config import settings
+from app.models.chat_message import ChatMessage
+
+Summarizer = Callable[[str, List[Dict]], str]
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+EXCERPT_CHARS = 160
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text; good enough for budgeting
+    return (len(text) + 3) // 4 if text else 0
+
+
+def _excerpt(text: str) -> str:
+    first = SENTENCE_END.split(text.strip(), maxsplit=1)[0]
+    return first if len(first) <= EXCERPT_CHARS else first[:EXCERPT_CHARS - 3] + "..."
+
+
+def extractive_summary(previous: str, turns: List[Dict]) -> str:
+    """Default summarizer: one line per turn, oldest lines dropped to fit the summary budget"""
+    lines = previous.splitlines() if previous else []
+    for turn in turns:
+        lines.append(f"User: {_excerpt(turn['prompt'])} / Assistant: {_excerpt(turn['response'])}")
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > settings.CONTEXT_SUMMARY_TOKEN_BUDGET:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+_summarizer: Summarizer = extractive_summary
+
+
+def set_summarizer(summarizer: Summarizer):
+    """Swap in a model-backed summarizer; it receives the old summary and the turns to fold"""
+    global _summarizer
+    _summarizer = summarizer
+
+
+def _cache_key(chat_id: int) -> str:
+    return f"chatctx:{chat_id}"
+
+
+def _empty_state() -> Dict:
+    return {"summary": "", "summarized_through": None}
+
+
+def _load_state(db: Session, chat_id: int) -> Dict:
+    client = get_redis()
+    if client is not None:
+        try:
+            cached = client.get(_cache_key(chat_id))
+            if cached:
+                return json.loads(cached)
+        except redis.RedisError as e:
+            redis_failed(e)
+
+    # Cache miss: the newest message carries the state it was answered with
+    latest = db.query(ChatMessage.context).filter(
+        ChatMessage.user_chat_id == chat_id
+    ).order_by(ChatMessage.created_on.desc()).first()
+    if latest and latest.context and "summarized_through" in latest.context:
+        return {
+            "summary": latest.context.get("summary", ""),
+            "summarized_through": latest.context["summarized_through"],
+        }
+    return _empty_state()
+
+
+def _through(state: Dict) -> Optional[datetime]:
+    return datetime.fromisoformat(state["summarized_through"]) if state.get("summarized_through") else None
+
+
+def save_context_state(chat_id: int, context: Dict, attempts: int = 3):
+    """
+    Cache the summary state a turn was answered with. Called after the turn's
+    message is committed; the cached summary only ever moves forward, so of two
+    concurrent turns the one that folded further wins.
+    """
+    client = get_redis()
+    if client is None:
+        return
+    key = _cache_key(chat_id)
+    state = {"summary": context["summary"], "summarized_through": context["summarized_through"]}
+    through = _through(state)
+    try:
+        with client.pipeline() as pipe:
+            for _ in range(attempts):
+                try:
+                    pipe.watch(key)
+                    cached = pipe.get(key)
+                    if cached:
+                        cached_through = _through(json.loads(cached))
+                        if cached_through is not None and (through is None or cached_through > through):
+                            pipe.unwatch()
+                            return
+                    pipe.multi()
+                    pipe.set(key, json.dumps(state), ex=settings.CONTEXT_CACHE_TTL_SECONDS)
+                    pipe.execute()
+                    return
+                except redis.WatchError:
+                    # Another turn saved in between; compare against its state
+                    continue
+    except redis.RedisError as e:
+        redis_failed(e)
+
+
+def _turn(message) -> Dict:
+    return {
+        "id": message.id,
+        "created_on": message.created_on.isoformat(),
+        "prompt": message.prompt,
+        "response": message.response,
+    }
+
+
+def _turn_tokens(turn: Dict) -> int:
+    return estimate_tokens(turn["prompt"]) + estimate_tokens(turn["response"])
+
+
+def build_context(db: Session, chat_id: int, prompt: str) -> Dict:
+    """
+    Context for answering `prompt` in a chat: the rolling summary and the
+    recent turns (oldest first) that fit the token budget.
+    """
+    state = _load_state(db, chat_id)
+    through = _through(state)
+
+    recent = db.query(
+        ChatMessage.id, ChatMessage.created_on, ChatMessage.prompt, ChatMessage.response
+    ).filter(
+        ChatMessage.user_chat_id == chat_id
+    ).order_by(ChatMessage.created_on.desc()).limit(settings.CONTEXT_RECENT_TURNS).all()
+    recent = [_turn(message) for message in reversed(recent)]
+
+    # Messages that left the verbatim window since the summary was last updated;
+    # normally exactly one per turn
+    to_fold: List[Dict] = []
+    if recent:
+        query = db.query(
+            ChatMessage.id, ChatMessage.created_on, ChatMessage.prompt, ChatMessage.response
+        ).filter(
+            ChatMessage.user_chat_id == chat_id,
+            ChatMessage.created_on < datetime.fromisoformat(recent[0]["created_on"])
+        )
+        if through is not None:
+            query = query.filter(ChatMessage.created_on > through)
+        # Bounded so a chat without cached state can't trigger a full history read
+        folded = query.order_by(ChatMessage.created_on.desc()).limit(settings.CONTEXT_FOLD_LIMIT).all()
+        to_fold = [_turn(message) for message in reversed(folded)]
+    if through is not None:
+        recent = [turn for turn in recent if datetime.fromisoformat(turn["created_on"]) > through]
+
+    # Keep the newest turns that fit next to the summary and the new prompt;
+    # anything older goes into the summary instead. Room is kept for the
+    # summary at its full budget, since folding those turns makes it grow.
+    summary_tokens = max(estimate_tokens(state["summary"]), settings.CONTEXT_SUMMARY_TOKEN_BUDGET)
+    available = settings.CONTEXT_TOKEN_BUDGET - estimate_tokens(prompt) - summary_tokens
+    verbatim: List[Dict] = []
+    for turn in reversed(recent):
+        cost = _turn_tokens(turn)
+        if cost > available:
+            break
+        verbatim.insert(0, turn)
+        available -= cost
+    to_fold += recent[:len(recent) - len(verbatim)]
+
+    if to_fold:
+        state = {
+            "summary": _summarizer(state["summary"], to_fold),
+            "summarized_through": to_fold[-1]["created_on"],
+        }
+    # The state is cached by record_message once the turn is stored
+
+    fixed = estimate_tokens(state["summary"]) + estimate_tokens(prompt)
+    turn_tokens = sum(_turn_tokens(turn) for turn in verbatim)
+    # A summarizer that overshoots its budget costs the oldest verbatim turns;
+    # they are newer than summarized_through, so the next turn folds them in
+    while verbatim and fixed + turn_tokens > settings.CONTEXT_TOKEN_BUDGET:
+        turn_tokens -= _turn_tokens(verbatim.pop(0))
+    return {
+        "summary": state["summary"],
+        "summarized_through": state["summarized_through"],
+        "turns": verbatim,
+        "tokens": fixed + turn_tokens,
+    }
+
+
+def context_record(context: Optional[Dict]) -> Optional[Dict]:
+    """What gets stored in ChatMessage.context: summary state and turn ids, not turn text"""
+    if context is None:
+        return None
+    return {
+        "summary": context["summary"],
+        "summarized_through": context["summarized_through"],
+        "turn_ids": [turn["id"] for turn in context["turns"]],
+        "tokens": context["tokens"],
+    }
@@ -0,0 +1,59 @@
+"""
+Background reaper for soft-deleted documents.
+
+`DELETE /api/documents/{id}` only flips `is_deleted`; this job removes the
+stored files from document storage and then deletes the rows in one statement.
+"""
+
+import logging
+from sqlalchemy import select, delete
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.storage import get_storage, storage_key
+from app.models.document import Document
+
+logger = logging.getLogger("alphalabs.reaper")
+
+
+def _remove_stored(storage, file_path: str):
+    try:
+        storage.delete(storage_key(file_path))
+    except ValueError as e:
+        logger.warning(f"Skipping {file_path}: {e}")
+
+
+def reap_deleted_documents(batch_size: int = None) -> int:
+    """Remove files and rows for up to `batch_size` soft-deleted documents"""
+    batch_size = batch_size or settings.DOCUMENT_REAPER_BATCH_SIZE
+    db = SessionLocal()
+    try:
+        # SKIP LOCKED lets several API workers run the reaper without colliding
+        rows = db.execute(
+            select(Document.id, Document.file_path, Document.variants)
+            .where(Document.is_deleted == True)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not rows:
+            db.rollback()
+            return 0
+
+        storage = get_storage()
+        for row in rows:
+            _remove_stored(storage, row.file_path)
+            for variant in row.variants or []:
+                _remove_stored(storage, variant["file_path"])
+
+        db.execute(
+            delete(Document).where(Document.id.in_([row.id for row in rows])),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+        logger.info(f"Reaped {len(rows)} deleted documents")
+        return len(rows)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,138 @@
+"""
+CPU-bound image work run inside the upload process pool.
+
+Kept free of app/database imports so pool workers start quickly and nothing
+unpicklable crosses the process boundary: inputs are paths and sizes, outputs
+are plain dicts.
+"""
+
+import math
+import os
+from typing import Dict, List, Tuple
+from PIL import Image, ImageOps
+
+BLURHASH_CHARACTERS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+BLURHASH_SAMPLE_SIZE = 32
+
+_SRGB_TO_LINEAR = [
+    (c / 255) / 12.92 if c / 255 <= 0.04045 else (((c / 255) + 0.055) / 1.055) ** 2.4
+    for c in range(256)
+]
+
+
+def _encode83(value: int, length: int) -> str:
+    result = ""
+    for i in range(1, length + 1):
+        digit = (value // (83 ** (length - i))) % 83
+        result += BLURHASH_CHARACTERS[digit]
+    return result
+
+
+def _linear_to_srgb(value: float) -> int:
+    v = max(0.0, min(1.0, value))
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * (v ** (1 / 2.4)) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value: float, exp: float) -> float:
+    return math.copysign(abs(value) ** exp, value)
+
+
+def blurhash(image: Image.Image, x_components: int = 4, y_components: int = 3) -> str:
+    """Encode a BlurHash placeholder (https://blurha.sh) from a small sample of the image"""
+    sample = image.convert("RGB")
+    sample.thumbnail((BLURHASH_SAMPLE_SIZE, BLURHASH_SAMPLE_SIZE))
+    width, height = sample.size
+    pixels = [tuple(_SRGB_TO_LINEAR[c] for c in p) for p in sample.getdata()]
+
+    cos_x = [[math.cos(math.pi * i * x / width) for x in range(width)] for i in range(x_components)]
+    cos_y = [[math.cos(math.pi * j * y / height) for y in range(height)] for j in range(y_components)]
+
+    factors: List[Tuple[float, float, float]] = []
+    for j in range(y_components):
+        for i in range(x_components):
+            normalisation = 1 if i == 0 and j == 0 else 2
+            r = g = b = 0.0
+            for y in range(height):
+                row = y * width
+                for x in range(width):
+                    basis = cos_x[i][x] * cos_y[j][y]
+                    pr, pg, pb = pixels[row + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = normalisation / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _encode83((x_components - 1) + (y_components - 1) * 9, 1)
+
+    if ac:
+        actual_max = max(abs(v) for factor in ac for v in factor)
+        quantised_max = max(0, min(82, int(math.floor(actual_max * 166 - 0.5))))
+        max_value = (quantised_max + 1) / 166
+        result += _encode83(quantised_max, 1)
+    else:
+        max_value = 1
+        result += _encode83(0, 1)
+
+    result += _encode83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+
+    for factor in ac:
+        r, g, b = (
+            max(0, min(18, int(math.floor(_sign_pow(v / max_value, 0.5) * 9 + 9.5))))
+            for v in factor
+        )
+        result += _encode83(r * 19 * 19 + g * 19 + b, 2)
+    return result
+
+
+def _has_alpha(image: Image.Image) -> bool:
+    return image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+
+
+def process_image(source_path: str, output_dir: str, sizes: Dict[str, int], quality: int = 80) -> Dict:
+    """
+    Write downscaled, recompressed variants of `source_path` into `output_dir`.
+
+    `sizes` maps a variant name to its longest edge in pixels; variants that
+    would not be smaller than the original are skipped. Opaque images are
+    re-encoded as progressive JPEG, images with transparency as WebP.
+    """
+    with Image.open(source_path) as opened:
+        image = ImageOps.exif_transpose(opened)
+        image.load()
+
+    alpha = _has_alpha(image)
+    if alpha:
+        image = image.convert("RGBA")
+        extension, mime_type, save_options = "webp", "image/webp", {"quality": quality, "method": 4}
+    else:
+        image = image.convert("RGB")
+        extension, mime_type, save_options = "jpg", "image/jpeg", {"quality": quality, "optimize": True, "progressive": True}
+
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    variants = []
+    for name, max_edge in sorted(sizes.items(), key=lambda item: item[1]):
+        if max(image.size) <= max_edge:
+            continue
+        resized = image.copy()
+        resized.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        path = os.path.join(output_dir, f"{stem}_{name}.{extension}")
+        resized.save(path, format="WEBP" if alpha else "JPEG", **save_options)
+        variants.append({
+            "name": name,
+            "file_path": path,
+            "width": resized.width,
+            "height": resized.height,
+            "file_size": os.path.getsize(path),
+            "mime_type": mime_type,
+        })
+
+    return {
+        "width": image.width,
+        "height": image.height,
+        "placeholder": blurhash(image),
+        "variants": variants,
+    }
@@ -0,0 +1,112 @@
+"""
+Post-upload image pipeline.
+
+Uploaded JPEG/PNG documents are handed to a process pool that writes
+thumbnail/medium variants and a BlurHash placeholder into a temporary
+directory; the variants are then saved to document storage and recorded on
+the document row.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.core.database import SessionLocal, set_session_user
+from app.core.storage import get_storage
+from app.models.document import Document
+from app.services.image_processing import process_image
+from app.services.list_versions import bump_list_version
+from app.services.sync import DOCUMENT, record_change
+
+logger = logging.getLogger("alphalabs.images")
+
+IMAGE_MIME_TYPES = {"image/jpeg", "image/png"}
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: never fork a process that holds DB connections and threads
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_image_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _store_variants(document_id: int, user_id: int, result: Dict):
+    db = SessionLocal()
+    set_session_user(db, user_id)
+    try:
+        updated = db.execute(
+            update(Document)
+            .where(Document.id == document_id, Document.is_deleted == False)
+            .values(variants=result["variants"], placeholder=result["placeholder"]),
+            execution_options={"synchronize_session": False},
+        )
+        stored = bool(updated.rowcount)
+        if stored:
+            record_change(db, user_id, DOCUMENT, document_id)
+        db.commit()
+    finally:
+        db.close()
+
+    if stored:
+        bump_list_version(user_id, "documents")
+        return
+    # Deleted while the variants were built: the reaper only knows about
+    # variants recorded on the row, so remove these files now
+    storage = get_storage()
+    for variant in result["variants"]:
+        try:
+            storage.delete(variant["file_path"])
+        except Exception as e:
+            logger.warning(f"Could not remove variant {variant['file_path']} of deleted document {document_id}: {e}")
+
+
+def _save_variants(result: Dict):
+    # Variants are stored next to the original under their file name
+    storage = get_storage()
+    for variant in result["variants"]:
+        key = os.path.basename(variant["file_path"])
+        storage.save_file(key, variant["file_path"], variant["mime_type"])
+        variant["file_path"] = key
+
+
+async def generate_document_variants(document_id: int, user_id: int, key: str):
+    """Background task: build variants in the process pool and save them on the document"""
+    loop = asyncio.get_running_loop()
+    storage = get_storage()
+    try:
+        with tempfile.TemporaryDirectory(prefix="variants-") as work_dir:
+            source = storage.local_path(key)
+            if source is None:
+                source = os.path.join(work_dir, os.path.basename(key))
+                await asyncio.to_thread(storage.download, key, source)
+            result = await loop.run_in_executor(
+                _get_pool(),
+                process_image,
+                source,
+                work_dir,
+                settings.IMAGE_VARIANT_SIZES,
+                settings.IMAGE_VARIANT_QUALITY,
+            )
+            await asyncio.to_thread(_save_variants, result)
+        await asyncio.to_thread(_store_variants, document_id, user_id, result)
+    except Exception as e:
+        logger.warning(f"Could not generate variants for document {document_id}: {e}")
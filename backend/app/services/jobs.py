@@ -0,0 +1,280 @@
+"""
+Chat job queue.
+
+Long-running work (reply generation) is submitted as a job and the HTTP request
+returns `202 Accepted` straight away; clients collect the result by long-poll
+or WebSocket. Two interchangeable backends:
+
+- LocalJobQueue: in-process asyncio queue and workers, for development and
+  single-process deployments.
+- RedisJobQueue: jobs in Redis, executed by `python worker.py` processes;
+  completion is announced on a pub/sub channel per job. A worker moves each
+  job id into its own processing list while it runs, so ids held by a worker
+  that died (its heartbeat key expired) are found by the other workers: jobs
+  that had not started go back on the queue, jobs that were running are
+  marked failed rather than run twice.
+
+Handlers are plain synchronous functions registered with `job_handler` and
+run in a worker thread, taking and returning JSON-serialisable dicts. A
+handler raises `JobFailed` to fail the job with a message for the client;
+any other exception fails it too, and is logged.
+"""
+
+import abc
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+logger = logging.getLogger("alphalabs.jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED = (DONE, FAILED)
+
+_handlers: Dict[str, Callable[[Dict], Dict]] = {}
+
+
+class JobFailed(Exception):
+    """Expected failure of a job; its message is the job's error"""
+
+
+def job_handler(kind: str):
+    def register(fn: Callable[[Dict], Dict]):
+        _handlers[kind] = fn
+        return fn
+    return register
+
+
+def _new_job(kind: str, payload: Dict, owner_id: int) -> Dict:
+    return {
+        "id": uuid.uuid4().hex,
+        "kind": kind,
+        "owner_id": owner_id,
+        "status": QUEUED,
+        "payload": payload,
+        "result": None,
+        "error": None,
+        "created_at": time.time(),
+    }
+
+
+def _execute(job: Dict) -> Dict:
+    """Run a job's handler and return the fields to record on it"""
+    handler = _handlers.get(job["kind"])
+    if handler is None:
+        return {"status": FAILED, "error": f"No handler for job kind {job['kind']}"}
+    try:
+        return {"status": DONE, "result": handler(job["payload"])}
+    except JobFailed as e:
+        logger.info(f"Job {job['id']} failed: {e}")
+        return {"status": FAILED, "error": str(e)}
+    except Exception as e:
+        logger.exception(f"Job {job['id']} failed")
+        return {"status": FAILED, "error": str(e)}
+
+
+class JobQueue(abc.ABC):
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abc.abstractmethod
+    async def submit(self, kind: str, payload: Dict, owner_id: int) -> Dict:
+        """Queue a job and return it"""
+
+    @abc.abstractmethod
+    async def get(self, job_id: str) -> Optional[Dict]:
+        """The job's current state, or None if it is unknown or expired"""
+
+    @abc.abstractmethod
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict]:
+        """The job once it finishes, or its current state after `timeout` seconds"""
+
+
+class LocalJobQueue(JobQueue):
+    def __init__(self, workers: int = None):
+        self._workers = workers or settings.JOB_WORKERS
+        self._jobs: Dict[str, Dict] = {}
+        self._events: Dict[str, asyncio.Event] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._work(), name=f"job-worker-{i}") for i in range(self._workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is None:
+                continue
+            job["status"] = RUNNING
+            job.update(await asyncio.to_thread(_execute, job))
+            job["finished_at"] = time.time()
+            self._events.pop(job_id).set()
+
+    def _prune(self):
+        cutoff = time.time() - settings.JOB_RESULT_TTL_SECONDS
+        for job_id in [j["id"] for j in self._jobs.values() if j.get("finished_at", time.time()) < cutoff]:
+            del self._jobs[job_id]
+
+    async def submit(self, kind: str, payload: Dict, owner_id: int) -> Dict:
+        self._prune()
+        job = _new_job(kind, payload, owner_id)
+        self._jobs[job["id"]] = job
+        self._events[job["id"]] = asyncio.Event()
+        await self._queue.put(job["id"])
+        return dict(job)
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict]:
+        event = self._events.get(job_id)
+        if event is not None:
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return await self.get(job_id)
+
+
+class RedisJobQueue(JobQueue):
+    QUEUE_KEY = "jobs:queue"
+    PROCESSING_KEY = "jobs:processing:{}"
+    WORKER_KEY = "jobs:worker:{}"
+
+    def __init__(self, url: str = None):
+        self._redis = aioredis.Redis.from_url(url or settings.REDIS_URL, decode_responses=True)
+
+    @staticmethod
+    def _key(job_id: str) -> str:
+        return f"jobs:{job_id}"
+
+    @staticmethod
+    def _channel(job_id: str) -> str:
+        return f"jobs:{job_id}:done"
+
+    async def stop(self):
+        await self._redis.aclose()
+
+    async def _save(self, job_id: str, fields: Dict):
+        encoded = {k: json.dumps(v) for k, v in fields.items()}
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.hset(self._key(job_id), mapping=encoded)
+        pipe.expire(self._key(job_id), settings.JOB_RESULT_TTL_SECONDS)
+        await pipe.execute()
+
+    async def submit(self, kind: str, payload: Dict, owner_id: int) -> Dict:
+        job = _new_job(kind, payload, owner_id)
+        await self._save(job["id"], job)
+        await self._redis.lpush(self.QUEUE_KEY, job["id"])
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        fields = await self._redis.hgetall(self._key(job_id))
+        if not fields:
+            return None
+        return {k: json.loads(v) for k, v in fields.items()}
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict]:
+        # Subscribe before reading the state so a completion can't slip in between
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(self._channel(job_id))
+        try:
+            job = await self.get(job_id)
+            if job is None or job["status"] in FINISHED:
+                return job
+            deadline = time.monotonic() + timeout
+            while (remaining := deadline - time.monotonic()) > 0:
+                if await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining):
+                    break
+            return await self.get(job_id)
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+
+    async def _finish(self, job_id: str, outcome: Dict):
+        await self._save(job_id, outcome)
+        await self._redis.publish(self._channel(job_id), outcome["status"])
+
+    async def _heartbeat(self, worker_id: str):
+        ttl = settings.JOB_WORKER_HEARTBEAT_SECONDS * 3
+        while True:
+            await self._redis.set(self.WORKER_KEY.format(worker_id), 1, ex=ttl)
+            await self.recover_stale(worker_id)
+            await asyncio.sleep(settings.JOB_WORKER_HEARTBEAT_SECONDS)
+
+    async def recover_stale(self, worker_id: str) -> int:
+        """Take over the processing lists of workers whose heartbeat expired"""
+        recovered = 0
+        own = self.PROCESSING_KEY.format(worker_id)
+        async for key in self._redis.scan_iter(match=self.PROCESSING_KEY.format("*")):
+            stale_id = key.rsplit(":", 1)[1]
+            if stale_id == worker_id or await self._redis.exists(self.WORKER_KEY.format(stale_id)):
+                continue
+            # LMOVE is atomic, so two workers recovering the same list never both get an id
+            while (job_id := await self._redis.lmove(key, own, "RIGHT", "LEFT")) is not None:
+                job = await self.get(job_id)
+                if job is not None and job["status"] == QUEUED:
+                    await self._redis.rpush(self.QUEUE_KEY, job_id)
+                elif job is not None and job["status"] == RUNNING:
+                    await self._finish(job_id, {"status": FAILED, "error": "Worker stopped while running the job"})
+                await self._redis.lrem(own, 1, job_id)
+                recovered += 1
+        if recovered:
+            logger.warning(f"Recovered {recovered} jobs from stopped workers")
+        return recovered
+
+    async def run_worker(self, worker_id: str):
+        """Consume jobs until cancelled"""
+        processing = self.PROCESSING_KEY.format(worker_id)
+        while True:
+            job_id = await self._redis.blmove(self.QUEUE_KEY, processing, 5, "RIGHT", "LEFT")
+            if job_id is None:
+                continue
+            job = await self.get(job_id)
+            if job is not None:
+                await self._save(job_id, {"status": RUNNING})
+                await self._finish(job_id, await asyncio.to_thread(_execute, job))
+            await self._redis.lrem(processing, 1, job_id)
+
+    async def run_workers(self, count: int):
+        """Run `count` consumers sharing one worker id and heartbeat (used by worker.py)"""
+        worker_id = uuid.uuid4().hex
+        await self._redis.set(self.WORKER_KEY.format(worker_id), 1, ex=settings.JOB_WORKER_HEARTBEAT_SECONDS * 3)
+        try:
+            await asyncio.gather(self._heartbeat(worker_id), *(self.run_worker(worker_id) for _ in range(count)))
+        finally:
+            await self._redis.delete(self.WORKER_KEY.format(worker_id))
+
+
+_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    global _queue
+    if _queue is None:
+        if settings.JOB_QUEUE_BACKEND == "redis":
+            _queue = RedisJobQueue()
+        else:
+            _queue = LocalJobQueue()
+    return _queue
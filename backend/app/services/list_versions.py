@@ -0,0 +1,97 @@
+"""
+Per-user version counters for the list endpoints, used to build ETags.
+
+Writers bump a scope after committing; list endpoints read the version before
+querying and answer `304 Not Modified` without touching the database when the
+client already has it. Scopes are "chats", "documents" and "messages:<chat_id>".
+
+A bump that fails (Redis down or erroring) is kept in memory and retried by
+the next list-version call or the periodic `retry_list_version_bumps` job;
+until then Redis would still hold the old version and answer 304 with a stale
+list. Only a process that dies before the retry loses a bump, for at most
+the 7-day key lifetime or until the next write to that list.
+"""
+
+import threading
+import time
+from typing import Optional, Set, Tuple
+import redis
+
+from app.core.cache import get_redis, redis_failed
+
+VERSION_TTL_SECONDS = 7 * 24 * 3600
+
+_pending: Set[Tuple[int, str]] = set()
+_pending_lock = threading.Lock()
+
+
+def _key(user_id: int, scope: str) -> str:
+    return f"listver:{user_id}:{scope}"
+
+
+def _seed() -> int:
+    # Counters start from the clock so a key recreated after eviction or a
+    # Redis restart never repeats a version a client may still hold
+    return time.time_ns()
+
+
+def get_list_version(user_id: int, scope: str) -> Optional[str]:
+    """Current version of a list, or None when Redis is unavailable"""
+    if _pending and not retry_list_version_bumps():
+        return None
+    client = get_redis()
+    if client is None:
+        return None
+    key = _key(user_id, scope)
+    try:
+        version = client.get(key)
+        if version is None:
+            client.set(key, _seed(), nx=True, ex=VERSION_TTL_SECONDS)
+            version = client.get(key)
+        return version
+    except redis.RedisError as e:
+        redis_failed(e)
+        return None
+
+
+def _bump(client: redis.Redis, bumps):
+    pipe = client.pipeline(transaction=False)
+    for user_id, scope in bumps:
+        key = _key(user_id, scope)
+        pipe.set(key, _seed(), nx=True)
+        pipe.incr(key)
+        pipe.expire(key, VERSION_TTL_SECONDS)
+    pipe.execute()
+
+
+def bump_list_version(user_id: int, *scopes: str):
+    """Invalidate cached copies of the given lists; call after the write commits"""
+    bumps = {(user_id, scope) for scope in scopes}
+    client = get_redis()
+    if client is not None:
+        try:
+            _bump(client, bumps)
+            return
+        except redis.RedisError as e:
+            redis_failed(e)
+    with _pending_lock:
+        _pending.update(bumps)
+
+
+def retry_list_version_bumps() -> bool:
+    """Apply bumps that failed earlier; True when none are left"""
+    global _pending
+    with _pending_lock:
+        bumps, _pending = _pending, set()
+    if not bumps:
+        return True
+    client = get_redis()
+    if client is not None:
+        try:
+            _bump(client, bumps)
+            return True
+        except redis.RedisError as e:
+            redis_failed(e)
+    with _pending_lock:
+        _pending.update(bumps)
+    return False
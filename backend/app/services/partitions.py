@@ -0,0 +1,188 @@
+"""
+Partition maintenance for chat_messages.
+
+chat_messages is range-partitioned by month on created_on. This module keeps
+partitions created ahead of time and moves partitions older than
+CHAT_ARCHIVE_AFTER_MONTHS into the compressed chat_messages_archive table.
+Everything here is PostgreSQL-only and a no-op on other databases.
+"""
+
+import logging
+import re
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.config import settings
+from app.models.chat_message import ChatMessage
+
+logger = logging.getLogger("alphalabs.partitions")
+
+PARENT_TABLE = "chat_messages"
+ARCHIVE_TABLE = "chat_messages_archive"
+PARTITION_NAME = re.compile(r"^chat_messages_p(\d{4})_(\d{2})$")
+
+# Serialises maintenance across API workers (arbitrary app-wide constant)
+MAINTENANCE_LOCK_ID = 7_202_601
+
+MESSAGE_COLUMNS = (
+    "id, created_on, updated_on, user_chat_id, user_id, client_id, "
+    "prompt, response, source, rating, context, is_voice"
+)
+
+
+def month_start(dt: datetime) -> datetime:
+    return datetime(dt.year, dt.month, 1)
+
+
+def add_months(dt: datetime, months: int) -> datetime:
+    index = dt.year * 12 + (dt.month - 1) + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARENT_TABLE}_p{month.year:04d}_{month.month:02d}"
+
+
+def archive_cutoff(now: Optional[datetime] = None) -> Optional[datetime]:
+    """Messages created before this instant live in the archive table"""
+    if settings.CHAT_ARCHIVE_AFTER_MONTHS <= 0:
+        return None
+    return add_months(month_start(now or datetime.utcnow()), -settings.CHAT_ARCHIVE_AFTER_MONTHS)
+
+
+def _is_postgres(engine: Engine) -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def _is_partitioned(conn: Connection) -> bool:
+    return conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"
+    ), {"table": PARENT_TABLE}).first() is not None
+
+
+def _existing_partitions(conn: Connection) -> List[str]:
+    rows = conn.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = to_regclass(:table)
+    """), {"table": PARENT_TABLE})
+    return [row[0] for row in rows]
+
+
+def _create_partition(conn: Connection, month: datetime):
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {PARENT_TABLE} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    ))
+
+
+def _create_partitions(conn: Connection, first: datetime, last: datetime):
+    month = month_start(first)
+    while month <= last:
+        _create_partition(conn, month)
+        month = add_months(month, 1)
+
+
+def ensure_chat_message_partitions(engine: Engine):
+    """Create monthly partitions from the current month to CHAT_PARTITION_MONTHS_AHEAD"""
+    if not _is_postgres(engine):
+        return
+
+    with engine.begin() as conn:
+        if not _is_partitioned(conn):
+            logger.warning(f"{PARENT_TABLE} is not partitioned; run init_db.py to convert it")
+            return
+        conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MAINTENANCE_LOCK_ID})
+        now = month_start(datetime.utcnow())
+        _create_partitions(conn, now, add_months(now, settings.CHAT_PARTITION_MONTHS_AHEAD))
+
+
+def archive_chat_message_partitions(engine: Engine) -> int:
+    """Move whole partitions older than the archive cutoff into the archive table"""
+    cutoff = archive_cutoff()
+    if cutoff is None or not _is_postgres(engine):
+        return 0
+
+    archived = 0
+    with engine.connect() as conn:
+        if not _is_partitioned(conn):
+            return 0
+        candidates = []
+        for name in _existing_partitions(conn):
+            match = PARTITION_NAME.match(name)
+            if match and add_months(datetime(int(match[1]), int(match[2]), 1), 1) <= cutoff:
+                candidates.append(name)
+        conn.rollback()
+
+        for name in sorted(candidates):
+            # One transaction per partition: rows are never visible in both tables.
+            # The copy runs before DETACH so the parent is only exclusively locked
+            # for the detach and drop at the very end. Sync holds back behind this
+            # transaction until it commits (see app/services/sync.py).
+            with conn.begin():
+                conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MAINTENANCE_LOCK_ID})
+                if name not in _existing_partitions(conn):
+                    continue
+                conn.execute(text(
+                    f"INSERT INTO {ARCHIVE_TABLE} ({MESSAGE_COLUMNS}) "
+                    f"SELECT {MESSAGE_COLUMNS} FROM {name} ON CONFLICT (id) DO NOTHING"
+                ))
+                conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+                conn.execute(text(f"DROP TABLE {name}"))
+            archived += 1
+            logger.info(f"Archived partition {name}")
+    return archived
+
+
+def maintain_chat_message_partitions(engine: Engine):
+    ensure_chat_message_partitions(engine)
+    archive_chat_message_partitions(engine)
+
+
+def convert_chat_messages_to_partitioned(engine: Engine):
+    """
+    One-off conversion of a pre-partitioning chat_messages table.
+
+    Renames the old table out of the way, creates the partitioned table with
+    partitions covering the existing rows and copies them across. Runs in a
+    single transaction, so writers are blocked for the duration of the copy.
+    """
+    if not _is_postgres(engine):
+        return
+
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT to_regclass(:table)"), {"table": PARENT_TABLE}).scalar() is None:
+            return
+        if _is_partitioned(conn):
+            return
+
+        logger.info(f"Converting {PARENT_TABLE} to a partitioned table")
+        legacy = f"{PARENT_TABLE}_legacy"
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} RENAME TO {legacy}"))
+        conn.execute(text(f"ALTER SEQUENCE IF EXISTS {PARENT_TABLE}_id_seq RENAME TO {legacy}_id_seq"))
+        # Index names are schema-wide, move the old ones out of the way too
+        for (index_name,) in conn.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE tablename = :table"
+        ), {"table": legacy}).all():
+            conn.execute(text(f'ALTER INDEX "{index_name}" RENAME TO "{index_name[:55]}_legacy"'))
+
+        ChatMessage.__table__.create(bind=conn)
+
+        bounds = conn.execute(text(f"SELECT min(created_on), max(created_on), max(id) FROM {legacy}")).first()
+        now = month_start(datetime.utcnow())
+        first = min(bounds[0], now) if bounds[0] else now
+        last = max(month_start(bounds[1]), now) if bounds[1] else now
+        _create_partitions(conn, first, add_months(last, settings.CHAT_PARTITION_MONTHS_AHEAD))
+
+        conn.execute(text(
+            f"INSERT INTO {PARENT_TABLE} ({MESSAGE_COLUMNS}) SELECT {MESSAGE_COLUMNS} FROM {legacy}"
+        ))
+        if bounds[2]:
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{PARENT_TABLE}', 'id'), :max_id)"
+            ), {"max_id": bounds[2]})
+        conn.execute(text(f"DROP TABLE {legacy}"))
+        logger.info(f"{PARENT_TABLE} converted")
@@ -0,0 +1,220 @@
+"""
+Change log behind the mobile client's delta sync (`GET /api/sync`).
+
+Writers call `record_change` inside the transaction that creates, updates or
+deletes a chat, message or document. On PostgreSQL every change row carries
+the id of the transaction that wrote it, and a sync cursor is a position in
+(txid, id) order. A sync only returns rows from transactions older than the
+oldest transaction still running, so a slow transaction that commits after a
+client synced can never land behind that client's cursor. Other databases
+fall back to plain id order.
+
+The horizon is global: any transaction that has written something and is
+still open (a long batch such as the chat archive copy in partitions.py, or a
+session left idle in transaction) holds back sync for every user until it
+ends. Clients then see no new changes, but nothing is lost. Moving past it
+would let that transaction's changes land behind issued cursors, so the
+horizon is never bounded; instead a warning naming the oldest open writing
+transaction is logged once it has held the horizon for
+SYNC_HORIZON_WARN_SECONDS.
+
+Change rows are pruned after SYNC_RETENTION_DAYS; a cursor older than that
+gets `full_resync` and the client reloads its lists.
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import and_, delete, func, or_, select, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.chat_message import ChatMessage
+from app.models.document import Document
+from app.models.sync_change import SyncChange
+from app.models.user_chat import UserChat
+
+logger = logging.getLogger("alphalabs.sync")
+
+CHAT = "chat"
+MESSAGE = "message"
+DOCUMENT = "document"
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+Position = Tuple[int, int]
+
+
+def record_change(db: Session, user_id: int, entity: str, entity_id: int, op: str = UPSERT):
+    """Log a change for the next sync; committed with the caller's transaction"""
+    db.add(SyncChange(user_id=user_id, entity=entity, entity_id=entity_id, op=op))
+
+
+def encode_cursor(position: Position) -> str:
+    return f"{position[0]}-{position[1]}-{int(time.time())}"
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[Position, int]]:
+    """(position, issued at) for a cursor, or None if it is malformed"""
+    try:
+        txid, change_id, issued = (int(part) for part in cursor.split("-"))
+    except ValueError:
+        return None
+    return (txid, change_id), issued
+
+
+def cursor_expired(issued: int) -> bool:
+    return issued < time.time() - settings.SYNC_RETENTION_DAYS * 86400
+
+
+# (horizon, when it was first seen held back, when a warning was last logged)
+_held_horizon: Optional[List] = None
+
+
+def _horizon_held_too_long(xmin: int, xmax: int) -> bool:
+    """Track how long `xmin` has held the horizon; True when a warning is due"""
+    global _held_horizon
+    if xmin >= xmax:
+        # No writing transaction open: the horizon is simply the next txid
+        _held_horizon = None
+        return False
+    now = time.monotonic()
+    if _held_horizon is None or _held_horizon[0] != xmin:
+        _held_horizon = [xmin, now, None]
+        return False
+    _, since, logged = _held_horizon
+    if now - since < settings.SYNC_HORIZON_WARN_SECONDS:
+        return False
+    if logged is not None and now - logged < settings.SYNC_HORIZON_WARN_SECONDS:
+        return False
+    _held_horizon[2] = now
+    return True
+
+
+def _warn_held_horizon(conn, xmin: int):
+    oldest = conn.execute(text(
+        "SELECT pid, application_name, state, now() - xact_start AS age, left(query, 200) AS query "
+        "FROM pg_stat_activity WHERE backend_xid IS NOT NULL "
+        "ORDER BY xact_start LIMIT 1"
+    )).first()
+    logger.warning(
+        f"Sync horizon stuck at txid {xmin} for over {settings.SYNC_HORIZON_WARN_SECONDS}s; "
+        f"no sync changes are delivered until the oldest writing transaction ends",
+        extra={"session": dict(oldest._mapping) if oldest else None},
+    )
+
+
+def _horizon(conn) -> Optional[int]:
+    # Every transaction below this id has finished, so its changes are all visible
+    if conn.dialect.name != "postgresql":
+        return None
+    xmin, xmax = conn.execute(text(
+        "SELECT txid_snapshot_xmin(s), txid_snapshot_xmax(s) FROM txid_current_snapshot() AS s"
+    )).one()
+    if _horizon_held_too_long(xmin, xmax):
+        _warn_held_horizon(conn, xmin)
+    return xmin
+
+
+def current_position(db: Session, user_id: int) -> Position:
+    """Cursor position for a client that has just loaded everything"""
+    conn = db.connection()
+    horizon = _horizon(conn)
+    if horizon is not None:
+        return (horizon, 0)
+    last_id = conn.execute(
+        select(func.max(SyncChange.id)).where(SyncChange.user_id == user_id)
+    ).scalar()
+    return (0, last_id or 0)
+
+
+def _load(db: Session, bind, model, ids, *criteria) -> Dict[int, object]:
+    if not ids:
+        return {}
+    rows = db.execute(
+        select(model).where(model.id.in_(ids), *criteria),
+        bind_arguments={"bind": bind},
+    ).scalars().all()
+    return {row.id: row for row in rows}
+
+
+def fetch_changes(db: Session, user_id: int, since: Position, limit: int) -> Dict:
+    """
+    Entities changed after `since`, deduplicated to their latest state.
+
+    Returns the chats, messages and documents that still exist, the ids of
+    those that were deleted, the next cursor position and whether more
+    changes are waiting.
+    """
+    # The horizon, the change log and the entities must come from the same
+    # database; on a lagging replica they would otherwise disagree
+    conn = db.connection()
+    bind = conn.engine
+    horizon = _horizon(conn)
+
+    txid, change_id = since
+    query = select(
+        SyncChange.id, SyncChange.txid, SyncChange.entity, SyncChange.entity_id, SyncChange.op
+    ).where(
+        SyncChange.user_id == user_id,
+        or_(SyncChange.txid > txid, and_(SyncChange.txid == txid, SyncChange.id > change_id)),
+    )
+    if horizon is not None:
+        query = query.where(SyncChange.txid < horizon)
+    rows = conn.execute(query.order_by(SyncChange.txid, SyncChange.id).limit(limit + 1)).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    position = (rows[-1].txid, rows[-1].id) if rows else since
+    if not has_more and horizon is not None:
+        # Nothing left below the horizon; later changes start at or above it
+        position = max(position, (horizon, 0))
+
+    latest: Dict[Tuple[str, int], str] = {}
+    for row in rows:
+        latest[(row.entity, row.entity_id)] = row.op
+
+    def ids(entity: str, op: str) -> List[int]:
+        return [entity_id for (kind, entity_id), last in latest.items() if kind == entity and last == op]
+
+    chats = _load(db, bind, UserChat, ids(CHAT, UPSERT), UserChat.user_id == user_id)
+    messages = _load(db, bind, ChatMessage, ids(MESSAGE, UPSERT), ChatMessage.user_id == user_id)
+    documents = _load(
+        db, bind, Document, ids(DOCUMENT, UPSERT),
+        Document.uploaded_by == user_id, Document.is_deleted == False
+    )
+
+    # An upserted entity that no longer exists was deleted since (e.g. by cascade)
+    deleted = {
+        "chats": ids(CHAT, DELETE) + [i for i in ids(CHAT, UPSERT) if i not in chats],
+        "messages": ids(MESSAGE, DELETE) + [i for i in ids(MESSAGE, UPSERT) if i not in messages],
+        "documents": ids(DOCUMENT, DELETE) + [i for i in ids(DOCUMENT, UPSERT) if i not in documents],
+    }
+    return {
+        "position": position,
+        "has_more": has_more,
+        "chats": list(chats.values()),
+        "messages": list(messages.values()),
+        "documents": list(documents.values()),
+        "deleted": deleted,
+    }
+
+
+def prune_sync_changes() -> int:
+    """Drop change rows older than SYNC_RETENTION_DAYS"""
+    cutoff = datetime.utcnow() - timedelta(days=settings.SYNC_RETENTION_DAYS)
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            delete(SyncChange).where(SyncChange.created_on < cutoff),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+    finally:
+        db.close()
+    if result.rowcount:
+        logger.info(f"Pruned {result.rowcount} sync changes")
+    return result.rowcount
@@ -0,0 +1,236 @@
+"""
+JWT revocation and active sessions.
+
+Revoked token ids (`jti`) are stored in Redis as `auth:revoked:{jti}` until
+the token would have expired anyway. Checking that key on every request would
+cost a Redis round-trip, so revocations are also added to a bloom filter that
+every API worker keeps in memory:
+
+- The filter is a Redis bitmap per UTC day (`auth:revoked-bloom:{YYYYMMDD}`).
+  A token can only matter until it expires, and tokens live at most
+  JWT_TOKEN_LIFETIME_HOURS, so a worker only needs the last few days'
+  bitmaps. Old ones expire and the filter never needs a rebuild.
+- `auth:revoked-bloom:version` is bumped on every revocation. Workers poll it
+  every REVOCATION_REFRESH_SECONDS and re-download the bitmaps when it moved.
+- A token that is not in the filter is accepted without touching Redis. A
+  filter hit (a revoked token, or rarely a false positive) is confirmed
+  against the `auth:revoked:{jti}` key.
+
+A revocation reaches other workers within REVOCATION_REFRESH_SECONDS; the
+worker that revoked sees it immediately. Without Redis nothing can be revoked
+and every token is accepted.
+
+Sessions (one per signin) are kept in the hash `auth:sessions:{user_id}`,
+keyed by jti.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import redis
+
+from app.core.cache import get_redis, get_redis_binary, redis_failed
+from app.core.config import settings
+
+logger = logging.getLogger("alphalabs.revocation")
+
+BLOOM_VERSION_KEY = "auth:revoked-bloom:version"
+
+
+def _revoked_key(jti: str) -> str:
+    return f"auth:revoked:{jti}"
+
+
+def _bloom_key(day: datetime) -> str:
+    return f"auth:revoked-bloom:{day.strftime('%Y%m%d')}"
+
+
+def _sessions_key(user_id: int) -> str:
+    return f"auth:sessions:{user_id}"
+
+
+def _bloom_days(now: Optional[datetime] = None) -> List[datetime]:
+    # Today's bitmap plus every earlier day a still-valid token could have been revoked on
+    now = now or datetime.utcnow()
+    days = -(-settings.JWT_TOKEN_LIFETIME_HOURS // 24) + 1
+    return [now - timedelta(days=i) for i in range(days)]
+
+
+def _bit_offsets(jti: str) -> List[int]:
+    # Double hashing: k positions from two 64-bit halves of one digest
+    digest = hashlib.sha256(jti.encode()).digest()
+    h1 = int.from_bytes(digest[:8], "big")
+    h2 = int.from_bytes(digest[8:16], "big") | 1
+    size = settings.REVOCATION_BLOOM_BITS
+    return [(h1 + i * h2) % size for i in range(settings.REVOCATION_BLOOM_HASHES)]
+
+
+class _LocalBloom:
+    """This worker's copy of the revocation filter"""
+
+    def __init__(self):
+        self.bits: Optional[bytearray] = None
+        self.version: Optional[str] = None
+        self.lock = threading.Lock()
+
+    def might_contain(self, jti: str) -> Optional[bool]:
+        """None when the filter has not been loaded yet"""
+        bits = self.bits
+        if bits is None:
+            return None
+        for offset in _bit_offsets(jti):
+            # Redis bitmaps number bits from the most significant bit of each byte
+            index = offset >> 3
+            if index >= len(bits) or not bits[index] & (0x80 >> (offset & 7)):
+                return False
+        return True
+
+    def add(self, jti: str):
+        with self.lock:
+            if self.bits is None:
+                return
+            for offset in _bit_offsets(jti):
+                index = offset >> 3
+                if index >= len(self.bits):
+                    self.bits.extend(bytes(index + 1 - len(self.bits)))
+                self.bits[index] |= 0x80 >> (offset & 7)
+
+
+_bloom = _LocalBloom()
+
+
+def refresh_revocation_filter():
+    """Periodic job: download the bitmaps if the filter changed since the last refresh"""
+    client = get_redis_binary()
+    if client is None:
+        return
+    try:
+        version = client.get(BLOOM_VERSION_KEY)
+        version = version.decode() if version else "0"
+        if version == _bloom.version and _bloom.bits is not None:
+            return
+        pipe = client.pipeline(transaction=False)
+        for day in _bloom_days():
+            pipe.get(_bloom_key(day))
+        bitmaps = [bitmap for bitmap in pipe.execute() if bitmap]
+    except redis.RedisError as e:
+        redis_failed(e)
+        return
+
+    size = max((len(bitmap) for bitmap in bitmaps), default=0)
+    combined = 0
+    for bitmap in bitmaps:
+        combined |= int.from_bytes(bitmap.ljust(size, b"\0"), "big")
+    with _bloom.lock:
+        _bloom.bits = bytearray(combined.to_bytes(size, "big"))
+        _bloom.version = version
+
+
+def is_revoked(jti: str) -> bool:
+    hit = _bloom.might_contain(jti)
+    if hit is False:
+        return False
+
+    client = get_redis()
+    if client is None:
+        return False
+    try:
+        return bool(client.exists(_revoked_key(jti)))
+    except redis.RedisError as e:
+        redis_failed(e)
+        # The filter says it is probably revoked; refuse rather than guess
+        return hit is True
+
+
+def revoke_token(jti: str, expires_at: datetime, user_id: Optional[int] = None) -> bool:
+    """Revoke a token until `expires_at`; returns False if Redis is unavailable"""
+    ttl = int((expires_at - datetime.utcnow()).total_seconds())
+    if ttl <= 0:
+        return True  # already expired
+
+    client = get_redis()
+    if client is None:
+        return False
+    try:
+        pipe = client.pipeline()
+        pipe.set(_revoked_key(jti), 1, ex=ttl)
+        bloom_key = _bloom_key(datetime.utcnow())
+        for offset in _bit_offsets(jti):
+            pipe.setbit(bloom_key, offset, 1)
+        # Keep the bitmap as long as any token revoked today can still be presented
+        pipe.expire(bloom_key, (settings.JWT_TOKEN_LIFETIME_HOURS + 24) * 3600)
+        pipe.incr(BLOOM_VERSION_KEY)
+        if user_id is not None:
+            pipe.hdel(_sessions_key(user_id), jti)
+        pipe.execute()
+    except redis.RedisError as e:
+        redis_failed(e)
+        return False
+
+    _bloom.add(jti)
+    logger.info(f"Revoked token {jti}")
+    return True
+
+
+def record_session(user_id: int, jti: str, client_id: int, issued_at: datetime, expires_at: datetime,
+                   user_agent: Optional[str] = None, ip: Optional[str] = None):
+    client = get_redis()
+    if client is None:
+        return
+    session = {
+        "jti": jti,
+        "client_id": client_id,
+        "issued_at": issued_at.isoformat(),
+        "expires_at": expires_at.isoformat(),
+        "user_agent": user_agent,
+        "ip": ip,
+    }
+    try:
+        pipe = client.pipeline()
+        pipe.hset(_sessions_key(user_id), jti, json.dumps(session))
+        pipe.expire(_sessions_key(user_id), settings.JWT_TOKEN_LIFETIME_HOURS * 3600)
+        pipe.execute()
+    except redis.RedisError as e:
+        redis_failed(e)
+
+
+def list_sessions(user_id: int) -> List[Dict]:
+    """Unexpired, unrevoked sessions, newest first; expired entries are pruned"""
+    client = get_redis()
+    if client is None:
+        return []
+    try:
+        entries = client.hgetall(_sessions_key(user_id))
+    except redis.RedisError as e:
+        redis_failed(e)
+        return []
+
+    now = datetime.utcnow()
+    sessions, expired = [], []
+    for jti, raw in entries.items():
+        session = json.loads(raw)
+        if datetime.fromisoformat(session["expires_at"]) <= now:
+            expired.append(jti)
+        else:
+            sessions.append(session)
+    if expired:
+        try:
+            client.hdel(_sessions_key(user_id), *expired)
+        except redis.RedisError as e:
+            redis_failed(e)
+    return sorted(sessions, key=lambda s: s["issued_at"], reverse=True)
+
+
+def get_session(user_id: int, jti: str) -> Optional[Dict]:
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        raw = client.hget(_sessions_key(user_id), jti)
+    except redis.RedisError as e:
+        redis_failed(e)
+        return None
+    return json.loads(raw) if raw else None
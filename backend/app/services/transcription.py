@@ -0,0 +1,150 @@
+"""
+Incremental speech-to-text for voice messages.
+
+`/api/chat/{chat_id}/voice` feeds audio chunks to a transcriber as they are
+recorded and streams partial transcripts back, so the reply can be generated
+as soon as the user stops speaking. Backends register with
+`transcriber_backend` and are chosen by TRANSCRIBER_BACKEND. There is no
+default: without a configured backend voice messages are refused.
+
+- `vosk`: offline recognition with Vosk. Needs `pip install vosk` and a model
+  (https://alphacephei.com/vosk/models) unpacked at VOSK_MODEL_PATH. Audio is
+  raw 16-bit little-endian mono PCM at VOICE_SAMPLE_RATE.
+- `stub`: deterministic, for tests only (ENVIRONMENT=test). The "audio" is
+  UTF-8 text and the transcript is that text, so a test can send b"what is "
+  and b"alpha" and expect "what is alpha".
+
+A transcriber is created per recording. Creating one, `feed` and `finish` are
+synchronous and run in a worker thread, so backends may block on a model or
+remote API.
+"""
+
+import abc
+import codecs
+import json
+import threading
+from typing import Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+# Backends that must never transcribe real recordings
+TEST_BACKENDS = {"stub"}
+
+_backends: Dict[str, Callable[[], "Transcriber"]] = {}
+
+
+def transcriber_backend(name: str):
+    def register(factory: Callable[[], "Transcriber"]):
+        _backends[name] = factory
+        return factory
+    return register
+
+
+class TranscriberUnavailable(RuntimeError):
+    pass
+
+
+class Transcriber(abc.ABC):
+    @abc.abstractmethod
+    def feed(self, chunk: bytes) -> Optional[str]:
+        """Add audio; returns the partial transcript so far, or None if it did not change"""
+
+    @abc.abstractmethod
+    def finish(self) -> str:
+        """Flush buffered audio and return the final transcript"""
+
+    def close(self):
+        """Release resources; called whether or not the recording finished"""
+
+
+@transcriber_backend("stub")
+class StubTranscriber(Transcriber):
+    def __init__(self):
+        # Chunk boundaries may split a multi-byte character
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._text = ""
+
+    def feed(self, chunk):
+        text = self._decoder.decode(chunk)
+        if not text:
+            return None
+        self._text += text
+        return self._text.strip()
+
+    def finish(self):
+        self._text += self._decoder.decode(b"", final=True)
+        return self._text.strip()
+
+
+_vosk_model = None
+_vosk_lock = threading.Lock()
+
+
+def _load_vosk_model():
+    # Loading takes seconds and the model is read-only, so it is shared by all recordings
+    global _vosk_model
+    try:
+        import vosk
+    except ImportError:
+        raise TranscriberUnavailable("The vosk transcriber backend needs `pip install vosk`")
+    if not settings.VOSK_MODEL_PATH:
+        raise TranscriberUnavailable("VOSK_MODEL_PATH is not set")
+    with _vosk_lock:
+        if _vosk_model is None:
+            vosk.SetLogLevel(-1)
+            try:
+                _vosk_model = vosk.Model(settings.VOSK_MODEL_PATH)
+            except Exception as e:
+                raise TranscriberUnavailable(f"Could not load the Vosk model: {e}")
+        return vosk, _vosk_model
+
+
+@transcriber_backend("vosk")
+class VoskTranscriber(Transcriber):
+    def __init__(self):
+        vosk, model = _load_vosk_model()
+        self._recognizer = vosk.KaldiRecognizer(model, settings.VOICE_SAMPLE_RATE)
+        self._segments: List[str] = []
+        self._partial = ""
+        # Chunk boundaries may split a 16-bit sample
+        self._odd = b""
+
+    def _text(self) -> str:
+        return " ".join(self._segments + ([self._partial] if self._partial else []))
+
+    def _end_segment(self, result: str):
+        text = json.loads(result).get("text", "")
+        if text:
+            self._segments.append(text)
+        self._partial = ""
+
+    def feed(self, chunk):
+        data = self._odd + chunk
+        even = len(data) - len(data) % 2
+        data, self._odd = data[:even], data[even:]
+        if not data:
+            return None
+        before = self._text()
+        # True when a pause ended an utterance
+        if self._recognizer.AcceptWaveform(data):
+            self._end_segment(self._recognizer.Result())
+        else:
+            self._partial = json.loads(self._recognizer.PartialResult()).get("partial", "")
+        text = self._text()
+        return text if text != before else None
+
+    def finish(self):
+        self._end_segment(self._recognizer.FinalResult())
+        return self._text()
+
+
+def create_transcriber(backend: str = None) -> Transcriber:
+    name = backend or settings.TRANSCRIBER_BACKEND
+    if not name:
+        raise TranscriberUnavailable("TRANSCRIBER_BACKEND is not set")
+    if name in TEST_BACKENDS and settings.ENVIRONMENT != "test":
+        raise TranscriberUnavailable(f"Transcriber backend {name} only runs with ENVIRONMENT=test")
+    factory = _backends.get(name)
+    if factory is None:
+        raise TranscriberUnavailable(f"Unknown transcriber backend: {name}")
+    return factory()
@@ -0,0 +1,147 @@
+"""
+Incrementally maintained usage rollups.
+
+`usage_daily` holds per-day counts for every (client, user): messages, voice
+messages, documents and document bytes. A periodic job folds in rows created
+since the last run, tracked by a created_on watermark in `rollup_watermarks`:
+
+- each run aggregates [watermark, end). created_on is stamped before the
+  commit, so on PostgreSQL `end` also stops short of the start of the oldest
+  open writing transaction: a row inside it can't be older than that, and is
+  picked up by the run after it commits rather than missed. The watermark
+  therefore only passes rows that are committed, however long the
+  transaction took. USAGE_ROLLUP_LATENESS_SECONDS is kept as a margin for
+  clock skew between the API hosts (which stamp created_on) and the database;
+  on other databases it is the only guard, and a row committed more than that
+  long after it was stamped is not counted.
+- the aggregate is added onto existing rollup rows with one upsert, and the
+  watermark moves in the same transaction, so a crashed run is simply redone.
+- a run covers at most USAGE_ROLLUP_MAX_WINDOW_HOURS, so the first backfill
+  over a large history happens in bounded steps.
+
+Scans use the BRIN indexes on created_on. Rows deleted after they were
+counted (chats, reaped documents) stay counted: this is usage history. The
+first run backfills from chat_messages and documents only, so messages that
+were already moved to the archive table are not included.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.core.config import settings
+from app.core.database import engine
+
+logger = logging.getLogger("alphalabs.usage")
+
+ROLLUP_NAME = "usage_daily"
+
+# Keeps concurrent API workers from double counting (arbitrary app-wide constant)
+ROLLUP_LOCK_ID = 7_202_602
+
+# Both sources produce one row per (day, client, user); documents without an
+# uploader are counted under user 0
+_AGGREGATE = """
+    SELECT day, client_id, user_id,
+           sum(messages) AS messages, sum(voice_messages) AS voice_messages,
+           sum(documents) AS documents, sum(document_bytes) AS document_bytes
+    FROM (
+        SELECT date(created_on) AS day, client_id, user_id,
+               count(*) AS messages,
+               sum(CASE WHEN is_voice = 1 THEN 1 ELSE 0 END) AS voice_messages,
+               0 AS documents, 0 AS document_bytes
+        FROM chat_messages
+        WHERE created_on >= :start AND created_on < :end
+        GROUP BY date(created_on), client_id, user_id
+        UNION ALL
+        SELECT date(created_on), client_id, coalesce(uploaded_by, 0),
+               0, 0, count(*), coalesce(sum(file_size), 0)
+        FROM documents
+        WHERE created_on >= :start AND created_on < :end
+        GROUP BY date(created_on), client_id, coalesce(uploaded_by, 0)
+    ) AS changes
+    GROUP BY day, client_id, user_id
+"""
+
+_UPSERT = f"""
+    INSERT INTO usage_daily (day, client_id, user_id, messages, voice_messages, documents, document_bytes, updated_on)
+    SELECT day, client_id, user_id, messages, voice_messages, documents, document_bytes, :now
+    FROM ({_AGGREGATE}) AS rollup
+    WHERE true
+    ON CONFLICT (day, client_id, user_id) DO UPDATE SET
+        messages = usage_daily.messages + EXCLUDED.messages,
+        voice_messages = usage_daily.voice_messages + EXCLUDED.voice_messages,
+        documents = usage_daily.documents + EXCLUDED.documents,
+        document_bytes = usage_daily.document_bytes + EXCLUDED.document_bytes,
+        updated_on = EXCLUDED.updated_on
+"""
+
+
+def _initial_watermark(conn: Connection) -> Optional[datetime]:
+    # Start at the oldest source row, floored to its day
+    oldest = conn.execute(text(
+        "SELECT min(created_on) FROM ("
+        "SELECT min(created_on) AS created_on FROM chat_messages "
+        "UNION ALL SELECT min(created_on) FROM documents) AS oldest"
+    )).scalar()
+    if oldest is None:
+        return None
+    if isinstance(oldest, str):  # SQLite
+        oldest = datetime.fromisoformat(oldest)
+    return datetime(oldest.year, oldest.month, oldest.day)
+
+
+def _oldest_open_transaction(conn: Connection) -> Optional[datetime]:
+    # Only transactions that have written something hold a txid
+    return conn.execute(text(
+        "SELECT min(xact_start) AT TIME ZONE 'UTC' FROM pg_stat_activity "
+        "WHERE backend_xid IS NOT NULL AND pid <> pg_backend_pid()"
+    )).scalar()
+
+
+def roll_up_usage() -> int:
+    """Periodic job: fold newly created messages and documents into usage_daily"""
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            # Another worker is already rolling up; its run covers ours
+            if not conn.execute(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": ROLLUP_LOCK_ID}).scalar():
+                return 0
+
+        start = conn.execute(
+            text("SELECT watermark FROM rollup_watermarks WHERE name = :name"), {"name": ROLLUP_NAME}
+        ).scalar()
+        if isinstance(start, str):  # SQLite
+            start = datetime.fromisoformat(start)
+        first_run = start is None
+        if first_run:
+            start = _initial_watermark(conn)
+            if start is None:
+                return 0
+
+        lateness = timedelta(seconds=settings.USAGE_ROLLUP_LATENESS_SECONDS)
+        end = min(now - lateness, start + timedelta(hours=settings.USAGE_ROLLUP_MAX_WINDOW_HOURS))
+        if engine.dialect.name == "postgresql":
+            oldest = _oldest_open_transaction(conn)
+            if oldest is not None:
+                end = min(end, oldest - lateness)
+        if end <= start:
+            return 0
+
+        rows = conn.execute(text(_UPSERT), {"start": start, "end": end, "now": now}).rowcount
+        if first_run:
+            conn.execute(
+                text("INSERT INTO rollup_watermarks (name, watermark, updated_on) VALUES (:name, :end, :now)"),
+                {"name": ROLLUP_NAME, "end": end, "now": now},
+            )
+        else:
+            conn.execute(
+                text("UPDATE rollup_watermarks SET watermark = :end, updated_on = :now WHERE name = :name"),
+                {"name": ROLLUP_NAME, "end": end, "now": now},
+            )
+
+    if rows:
+        logger.info(f"Rolled up usage through {end.isoformat()} ({rows} rows)")
+    return rows
@@ -7,12 +7,17 @@ Creates initial data and default client
 import asyncio
 from sqlalchemy.orm import Session
 from app.core.database import SessionLocal, engine
+from app.core.schema import upgrade_schema
+from app.services.partitions import convert_chat_messages_to_partitioned, ensure_chat_message_partitions
 from app.models import Base, User, Client
 from app.api.auth import get_password_hash
 
 def init_db():
     # Create tables
     Base.metadata.create_all(bind=engine)
+    convert_chat_messages_to_partitioned(engine)
+    upgrade_schema(engine)
+    ensure_chat_message_partitions(engine)
     
     db = SessionLocal()
     try:
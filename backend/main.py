@@ -1,5 +1,6 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy import text
 import uvicorn
@@ -7,10 +8,24 @@ import os
 import logging
 
 from app.core.config import settings
-from app.api import auth, chat, documents, users
-from app.core.database import engine, Base
+from app.api import auth, chat, documents, users, sync, admin
+from app.core.database import engine, Base, replica_engine, check_replica
+from app.core.schema import upgrade_schema
+from app.core import background
+from app.core.log import setup_logging, RequestContextMiddleware
+from app.core.profiling import ProfilingMiddleware
+from app.core.storage import get_storage
+from app.services.document_reaper import reap_deleted_documents
+from app.services.partitions import ensure_chat_message_partitions, maintain_chat_message_partitions
+from app.services.chat_activity import flush_chat_activity
+from app.services.image_variants import shutdown_image_pool
+from app.services.jobs import get_job_queue
+from app.services.list_versions import retry_list_version_bumps
+from app.services.sync import prune_sync_changes
+from app.services.usage_rollups import roll_up_usage
+from app.services.token_revocation import refresh_revocation_filter
 
-logging.basicConfig(level=logging.INFO)
+setup_logging()
 logger = logging.getLogger("alphalabs.api")
 
 # Create database tables
@@ -38,15 +53,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Static uploads
-os.makedirs("uploads", exist_ok=True)
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Compress larger JSON bodies (chat histories, document lists)
+app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MINIMUM_SIZE)
+
+# Per-request profiles (inside the request id middleware so profiles carry the id)
+app.add_middleware(ProfilingMiddleware)
+
+# Request ids and sampled access logs (outermost, so it times the whole request)
+app.add_middleware(RequestContextMiddleware)
+
+# Static uploads (local storage backend)
+os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
 
 # Routers
 app.include_router(auth, prefix="/api/auth", tags=["Authentication"])
 app.include_router(chat, prefix="/api/chat", tags=["Chat"])
 app.include_router(documents, prefix="/api/documents", tags=["Documents"])
 app.include_router(users, prefix="/api/users", tags=["Users"])
+app.include_router(sync, prefix="/api/sync", tags=["Sync"])
+app.include_router(admin, prefix="/api/admin", tags=["Admin"])
 
 @app.on_event("startup")
 async def on_startup():
@@ -58,6 +84,18 @@ async def on_startup():
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.warning(f"Could not create database tables: {e}")
+
+    try:
+        upgrade_schema(engine)
+    except Exception as e:
+        logger.warning(f"Could not apply schema upgrades: {e}")
+
+    # Message inserts fail without a partition for the current month, so make
+    # sure one exists before serving traffic
+    try:
+        ensure_chat_message_partitions(engine)
+    except Exception as e:
+        logger.warning(f"Could not create chat message partitions: {e}")
     
     # Optional quick DB ping at startup (non-fatal)
     try:
@@ -94,6 +132,45 @@ async def on_startup():
             logger.warning(f"Could not ensure test user: {e}")
     # -----------------------------------------------
 
+    # Document storage
+    try:
+        storage = get_storage()
+        if settings.STORAGE_BACKEND == "s3" and settings.S3_CREATE_BUCKET:
+            storage.ensure_bucket()
+        logger.info(f"Document storage: {settings.STORAGE_BACKEND}")
+    except Exception as e:
+        logger.warning(f"Could not initialise document storage: {e}")
+
+    # Chat job queue (starts in-process workers for the local backend)
+    await get_job_queue().start()
+
+    # Background jobs
+    if replica_engine is not None:
+        background.start_periodic("replica-health", settings.REPLICA_HEALTH_CHECK_SECONDS, check_replica)
+    refresh_revocation_filter()
+    background.start_periodic("revocation-filter", settings.REVOCATION_REFRESH_SECONDS, refresh_revocation_filter)
+    background.start_periodic("chat-activity", settings.CHAT_ACTIVITY_FLUSH_SECONDS, flush_chat_activity)
+    background.start_periodic("list-versions", settings.REDIS_RETRY_SECONDS, retry_list_version_bumps)
+    background.start_periodic("document-reaper", settings.DOCUMENT_REAPER_INTERVAL_SECONDS, reap_deleted_documents)
+    background.start_periodic("sync-prune", settings.SYNC_PRUNE_INTERVAL_SECONDS, prune_sync_changes)
+    background.start_periodic("usage-rollup", settings.USAGE_ROLLUP_INTERVAL_SECONDS, roll_up_usage)
+    background.start_periodic(
+        "chat-partitions",
+        settings.CHAT_PARTITION_MAINTENANCE_INTERVAL_SECONDS,
+        lambda: maintain_chat_message_partitions(engine),
+    )
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await background.stop_all()
+    await get_job_queue().stop()
+    shutdown_image_pool()
+    # Don't lose buffered chat activity on a clean shutdown
+    try:
+        flush_chat_activity()
+    except Exception as e:
+        logger.warning(f"Could not flush chat activity: {e}")
+
 @app.get("/")
 async def root():
     return {"message": "AlphaLabs Mobile API is running!"}
@@ -120,8 +197,9 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,            
         reload=True,            
-        access_log=True,
-        log_level="debug",
+        access_log=False,  # sampled by RequestContextMiddleware
+        log_config=None,  # keep the logging set up by setup_logging
+        log_level=settings.LOG_LEVEL.lower(),
         proxy_headers=True,
         forwarded_allow_ips="*",
     )
@@ -0,0 +1,94 @@
+"""
+Test setup: SQLite instead of PostgreSQL, fakeredis instead of Redis, auth
+disabled (requests run as the dev user) and strict query budgets.
+
+    pip install -r requirements-dev.txt
+    pytest
+"""
+
+import itertools
+import os
+import tempfile
+
+_db_dir = tempfile.mkdtemp(prefix="alphalabs-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_db_dir}/test.db",
+    "DATABASE_REPLICA_URL": "",
+    "ENVIRONMENT": "test",
+    "DISABLE_AUTH": "True",
+    "ADMIN_EMAILS": '["dev@alphalabs.com"]',
+    "QUERY_BUDGET_STRICT": "True",
+    "TRANSCRIBER_BACKEND": "stub",
+    "UPLOAD_DIR": f"{_db_dir}/uploads",
+    "LOG_FORMAT": "text",
+    # Tests flush chat activity themselves
+    "CHAT_ACTIVITY_FLUSH_SECONDS": "3600",
+})
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import app.core.cache as cache
+from app.models import ChatMessage
+
+_redis_server = fakeredis.FakeServer()
+cache._client = fakeredis.FakeRedis(server=_redis_server, decode_responses=True)
+cache._binary_client = fakeredis.FakeRedis(server=_redis_server)
+
+# SQLite only autoincrements single-column primary keys; chat_messages is keyed
+# on (id, created_on) for partitioning
+_message_ids = itertools.count(1)
+ChatMessage.__table__.c.id.autoincrement = False
+
+
+@event.listens_for(ChatMessage, "before_insert")
+def _assign_message_id(mapper, connection, target):
+    if target.id is None:
+        target.id = next(_message_ids)
+
+
+@event.listens_for(Engine, "connect")
+def _enforce_foreign_keys(dbapi_connection, connection_record):
+    # PostgreSQL cascades chat and user deletes; SQLite only does once asked to
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+import main  # noqa: E402 - reads the settings above
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as test_client:
+        # The bearer scheme still wants a header; with DISABLE_AUTH any token is the dev user
+        test_client.headers["Authorization"] = "Bearer test"
+        yield test_client
+
+
+@pytest.fixture
+def chat_id(client):
+    response = client.post("/api/chat/", json={"title": "Test chat"})
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+class RedisOutage:
+    def start(self):
+        _redis_server.connected = False
+
+    def end(self):
+        _redis_server.connected = True
+        # Skip the reconnect backoff
+        cache._down_until = 0.0
+
+
+@pytest.fixture
+def redis_outage():
+    """`start()` makes Redis fail; it comes back at `end()` or when the test ends"""
+    outage = RedisOutage()
+    yield outage
+    outage.end()
@@ -0,0 +1,51 @@
+from app.core.database import SessionLocal
+from app.models import ChatMessage, UserChat
+from app.services.chat_activity import flush_chat_activity
+
+
+def test_deleting_a_chat_removes_its_messages(client, chat_id):
+    for content in ("one", "two"):
+        client.post(f"/api/chat/{chat_id}/messages", json={"content": content})
+
+    assert client.delete(f"/api/chat/{chat_id}").status_code == 204
+    db = SessionLocal()
+    try:
+        assert db.query(ChatMessage).filter(ChatMessage.user_chat_id == chat_id).count() == 0
+    finally:
+        db.close()
+    assert client.get(f"/api/chat/{chat_id}/messages").status_code == 404
+    assert chat_id not in [chat["id"] for chat in client.get("/api/chat/").json()]
+
+
+def _last_message(chat_id):
+    db = SessionLocal()
+    try:
+        return db.get(UserChat, chat_id).last_message
+    finally:
+        db.close()
+
+
+def _order(client, chat_ids):
+    return [chat["id"] for chat in client.get("/api/chat/").json() if chat["id"] in chat_ids]
+
+
+def test_chat_list_follows_activity_before_and_after_a_flush(client):
+    flush_chat_activity()
+    chats = [client.post("/api/chat/", json={"title": f"Chat {i}"}).json()["id"] for i in range(3)]
+    first, second, third = chats
+    # No messages yet: newest chat first
+    assert _order(client, chats) == [third, second, first]
+
+    client.post(f"/api/chat/{first}/messages", json={"content": "hello"})
+    # Not flushed yet: the order comes from the message table
+    assert _last_message(first) is None
+    assert _order(client, chats) == [first, third, second]
+    flush_chat_activity()
+    assert _last_message(first) is not None
+    assert _order(client, chats) == [first, third, second]
+
+    client.post(f"/api/chat/{second}/messages", json={"content": "hello"})
+    # Stored value for the first chat, message table for the second
+    assert _order(client, chats) == [second, first, third]
+    flush_chat_activity()
+    assert _order(client, chats) == [second, first, third]
@@ -0,0 +1,85 @@
+import json
+
+from app.core import cache
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services import conversation_context
+from app.services.conversation_context import build_context, estimate_tokens, save_context_state
+
+
+def _cached(chat_id):
+    raw = cache.get_redis().get(f"chatctx:{chat_id}")
+    return json.loads(raw) if raw else None
+
+
+def _send(client, chat_id, content):
+    assert client.post(f"/api/chat/{chat_id}/messages", json={"content": content}).status_code == 200
+
+
+def test_state_is_cached_after_the_turn_is_stored(client, chat_id, monkeypatch):
+    monkeypatch.setattr(settings, "CONTEXT_RECENT_TURNS", 2)
+    for i in range(4):
+        _send(client, chat_id, f"question {i}")
+    state = _cached(chat_id)
+    assert state["summarized_through"] is not None
+    assert "question 0" in state["summary"]
+
+    # Building the next prompt (e.g. before a generation that fails) leaves the cache alone
+    db = SessionLocal()
+    try:
+        context = build_context(db, chat_id, "question 4")
+    finally:
+        db.close()
+    assert context["summarized_through"] > state["summarized_through"]
+    assert _cached(chat_id) == state
+
+
+def test_cached_summary_never_moves_backwards(client, chat_id):
+    newer = {"summary": "newer", "summarized_through": "2026-01-02T00:00:00"}
+    older = {"summary": "older", "summarized_through": "2026-01-01T00:00:00"}
+    save_context_state(chat_id, newer)
+    save_context_state(chat_id, older)
+    assert _cached(chat_id)["summary"] == "newer"
+    save_context_state(chat_id, {"summary": "", "summarized_through": None})
+    assert _cached(chat_id)["summary"] == "newer"
+
+
+def _build(chat_id, prompt):
+    db = SessionLocal()
+    try:
+        return build_context(db, chat_id, prompt)
+    finally:
+        db.close()
+
+
+def _total(context, prompt):
+    return (
+        estimate_tokens(context["summary"]) + estimate_tokens(prompt)
+        + sum(estimate_tokens(t["prompt"]) + estimate_tokens(t["response"]) for t in context["turns"])
+    )
+
+
+def test_context_stays_within_budget_as_the_summary_grows(client, chat_id, monkeypatch):
+    monkeypatch.setattr(settings, "CONTEXT_TOKEN_BUDGET", 400)
+    monkeypatch.setattr(settings, "CONTEXT_SUMMARY_TOKEN_BUDGET", 200)
+    monkeypatch.setattr(settings, "CONTEXT_RECENT_TURNS", 6)
+    prompt = "next " * 20
+    for i in range(12):
+        _send(client, chat_id, f"question {i} " + "detail " * 30)
+        context = _build(chat_id, prompt)
+        assert context["tokens"] == _total(context, prompt)
+        assert context["tokens"] <= settings.CONTEXT_TOKEN_BUDGET
+    assert context["summary"] and context["turns"]
+
+
+def test_overshooting_summarizer_costs_verbatim_turns(client, chat_id, monkeypatch):
+    monkeypatch.setattr(settings, "CONTEXT_TOKEN_BUDGET", 600)
+    monkeypatch.setattr(settings, "CONTEXT_SUMMARY_TOKEN_BUDGET", 20)
+    monkeypatch.setattr(settings, "CONTEXT_RECENT_TURNS", 6)
+    # Ignores its budget: 50 tokens more per folded turn
+    monkeypatch.setattr(conversation_context, "_summarizer", lambda previous, turns: previous + "x" * 200 * len(turns))
+    for i in range(8):
+        _send(client, chat_id, f"question {i} " + "detail " * 30)
+        context = _build(chat_id, "next")
+        assert context["tokens"] == _total(context, "next")
+        assert context["tokens"] <= settings.CONTEXT_TOKEN_BUDGET
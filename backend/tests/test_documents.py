@@ -0,0 +1,148 @@
+import io
+
+import boto3
+import pytest
+from moto import mock_s3
+
+from app.core import storage
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import Document, User
+from app.services.document_reaper import reap_deleted_documents
+
+
+def _upload_locally(client, content=b"hello"):
+    response = client.post(
+        "/api/documents/upload",
+        files={"file": ("notes.txt", io.BytesIO(content), "text/plain")},
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_missing_local_file_is_404(client, monkeypatch):
+    document = _upload_locally(client)
+    # Served from the static mount normally; the content endpoint is the fallback
+    key = document["url"].rsplit("/", 1)[1]
+    storage.get_storage().delete(key)
+    response = client.get(f"/api/documents/{document['id']}/content")
+    assert response.status_code == 404
+
+
+def test_direct_upload_needs_s3(client):
+    response = client.post("/api/documents/uploads", json={"filename": "a.pdf", "mime_type": "application/pdf"})
+    assert response.status_code == 409
+
+
+@pytest.fixture
+def s3_storage(monkeypatch):
+    with mock_s3():
+        monkeypatch.setattr(settings, "STORAGE_BACKEND", "s3")
+        monkeypatch.setattr(settings, "S3_ACCESS_KEY_ID", "test")
+        monkeypatch.setattr(settings, "S3_SECRET_ACCESS_KEY", "test")
+        s3 = storage.S3Storage()
+        s3.ensure_bucket()
+        monkeypatch.setattr(storage, "_storage", s3)
+        yield s3
+
+
+def test_direct_upload(client, s3_storage):
+    response = client.post(
+        "/api/documents/uploads",
+        json={"filename": "report.pdf", "mime_type": "application/pdf", "title": "Q3 report"},
+    )
+    assert response.status_code == 200
+    upload = response.json()
+    assert upload["fields"]["Content-Type"] == "application/pdf"
+    complete = {"upload_token": upload["upload_token"]}
+
+    # Not uploaded yet
+    assert client.post("/api/documents/uploads/complete", json=complete).status_code == 400
+
+    # What the app does with url/fields, minus the HTTP round-trip to the bucket
+    s3_storage.client.put_object(Bucket=s3_storage.bucket, Key=upload["fields"]["key"], Body=b"%PDF-1.7")
+    response = client.post("/api/documents/uploads/complete", json=complete)
+    assert response.status_code == 200
+    document = response.json()
+    assert (document["title"], document["original_filename"], document["file_size"]) == ("Q3 report", "report.pdf", 8)
+
+    # Completing again returns the same document
+    assert client.post("/api/documents/uploads/complete", json=complete).json()["id"] == document["id"]
+
+
+def test_concurrent_completions_record_one_document(client, s3_storage, monkeypatch):
+    upload = client.post("/api/documents/uploads", json={"filename": "a.pdf", "mime_type": "application/pdf"}).json()
+    key = upload["fields"]["key"]
+    s3_storage.client.put_object(Bucket=s3_storage.bucket, Key=key, Body=b"%PDF-1.7")
+
+    # Another retry records the document while this one is checking the upload
+    size = s3_storage.size
+    recorded = []
+
+    def size_while_another_completes(key):
+        db = SessionLocal()
+        try:
+            user_id = db.query(User.id).filter(User.email == "dev@alphalabs.com").scalar()
+            document = Document(
+                client_id=1, title="a.pdf", original_filename="a.pdf", file_path=key,
+                file_size=8, mime_type="application/pdf", uploaded_by=user_id,
+            )
+            db.add(document)
+            db.commit()
+            recorded.append(document.id)
+        finally:
+            db.close()
+        return size(key)
+
+    monkeypatch.setattr(s3_storage, "size", size_while_another_completes)
+    response = client.post("/api/documents/uploads/complete", json={"upload_token": upload["upload_token"]})
+    assert response.status_code == 200
+    assert response.json()["id"] == recorded[0]
+
+
+def test_upload_token_is_not_an_access_token(client, s3_storage, monkeypatch):
+    upload = client.post("/api/documents/uploads", json={"filename": "a.pdf", "mime_type": "application/pdf"}).json()
+    monkeypatch.setattr(settings, "DISABLE_AUTH", False)
+    response = client.get("/api/auth/me", headers={"Authorization": f"Bearer {upload['upload_token']}"})
+    assert response.status_code == 401
+
+
+def test_tampered_upload_token_is_rejected(client, s3_storage):
+    upload = client.post("/api/documents/uploads", json={"filename": "a.pdf", "mime_type": "application/pdf"}).json()
+    response = client.post("/api/documents/uploads/complete", json={"upload_token": upload["upload_token"][:-2] + "xx"})
+    assert response.status_code == 400
+
+
+def test_deleted_document_leaves_the_list(client):
+    document = _upload_locally(client)
+    assert document["id"] in [d["id"] for d in client.get("/api/documents/").json()]
+
+    assert client.delete(f"/api/documents/{document['id']}").status_code == 204
+    assert document["id"] not in [d["id"] for d in client.get("/api/documents/").json()]
+    assert client.get(f"/api/documents/{document['id']}").status_code == 404
+
+
+def test_reaper_removes_files_and_rows(client):
+    document = _upload_locally(client)
+    key = document["url"].rsplit("/", 1)[1]
+    db = SessionLocal()
+    try:
+        row = db.get(Document, document["id"])
+        storage.get_storage().save("reaped_thumb.jpg", io.BytesIO(b"variant"))
+        row.variants = [{"name": "thumbnail", "file_path": "reaped_thumb.jpg", "width": 1, "height": 1,
+                         "file_size": 7, "mime_type": "image/jpeg"}]
+        db.commit()
+    finally:
+        db.close()
+    client.delete(f"/api/documents/{document['id']}")
+
+    while reap_deleted_documents():
+        pass
+
+    db = SessionLocal()
+    try:
+        assert db.get(Document, document["id"]) is None
+    finally:
+        db.close()
+    assert storage.get_storage().size(key) is None
+    assert storage.get_storage().size("reaped_thumb.jpg") is None
@@ -0,0 +1,61 @@
+import os
+
+from PIL import Image
+
+from app.services.image_processing import blurhash, process_image
+
+SIZES = {"thumbnail": 100, "medium": 200, "large": 1000}
+
+
+def _gradient(width: int = 32, height: int = 24) -> Image.Image:
+    image = Image.new("RGB", (width, height))
+    for y in range(height):
+        for x in range(width):
+            image.putpixel((x, y), (x * 8 % 256, y * 10 % 256, (x * y) % 256))
+    return image
+
+
+def test_blurhash_matches_the_reference_encoder():
+    # Expected value from the reference encoder: blurhash.encode(pixels, 4, 3)
+    assert blurhash(_gradient()) == "LxH27h2lwtX3mAWUjwfAgFfmfTfi"
+
+
+def test_blurhash_of_a_flat_image():
+    # Reference: blurhash.encode(pixels, 1, 1)
+    assert blurhash(Image.new("RGB", (8, 8), (255, 0, 0)), 1, 1) == "00TI:j"
+
+
+def test_opaque_variants_are_jpeg_within_their_edge(tmp_path):
+    source = tmp_path / "photo.png"
+    _gradient(400, 300).save(source)
+
+    result = process_image(str(source), str(tmp_path), SIZES)
+
+    assert (result["width"], result["height"]) == (400, 300)
+    # No variant at least as large as the original
+    assert [v["name"] for v in result["variants"]] == ["thumbnail", "medium"]
+    for variant, size in zip(result["variants"], [(100, 75), (200, 150)]):
+        assert (variant["width"], variant["height"]) == size
+        assert variant["mime_type"] == "image/jpeg"
+        assert variant["file_path"].endswith(".jpg")
+        assert variant["file_size"] == os.path.getsize(variant["file_path"])
+        with Image.open(variant["file_path"]) as saved:
+            assert saved.format == "JPEG" and saved.size == size
+    assert len(result["placeholder"]) == 28
+
+
+def test_transparent_images_become_webp(tmp_path):
+    source = tmp_path / "logo.png"
+    image = _gradient(300, 300).convert("RGBA")
+    image.putalpha(128)
+    image.save(source)
+
+    result = process_image(str(source), str(tmp_path), {"thumbnail": 100})
+
+    [variant] = result["variants"]
+    assert variant["mime_type"] == "image/webp"
+    assert variant["file_path"].endswith(".webp")
+    with Image.open(variant["file_path"]) as saved:
+        assert saved.format == "WEBP" and saved.size == (100, 100)
+        assert saved.mode == "RGBA"
+        assert saved.getpixel((50, 50))[3] < 255
@@ -0,0 +1,57 @@
+import io
+import os
+import uuid
+
+from app.core.database import SessionLocal
+from app.core.storage import get_storage
+from app.models.document import Document
+from app.models.user import User
+from app.services.image_variants import _store_variants
+
+
+def _saved_variant(key: str) -> dict:
+    storage = get_storage()
+    storage.save(key, io.BytesIO(b"variant"))
+    return {"name": "thumbnail", "file_path": key, "width": 1, "height": 1, "file_size": 7, "mime_type": "image/jpeg"}
+
+
+def _document(is_deleted: bool) -> tuple:
+    db = SessionLocal()
+    try:
+        user_id = db.query(User.id).filter(User.email == "dev@alphalabs.com").scalar()
+        document = Document(
+            client_id=1, title="Photo", original_filename="photo.jpg", file_path=f"photo-{uuid.uuid4().hex}.jpg",
+            mime_type="image/jpeg", uploaded_by=user_id, is_deleted=is_deleted,
+        )
+        db.add(document)
+        db.commit()
+        return document.id, user_id
+    finally:
+        db.close()
+
+
+def test_variants_are_recorded_on_live_documents(client):
+    document_id, user_id = _document(is_deleted=False)
+    result = {"variants": [_saved_variant("live_thumb.jpg")], "placeholder": "LKO2"}
+    _store_variants(document_id, user_id, result)
+
+    db = SessionLocal()
+    try:
+        assert db.get(Document, document_id).variants == result["variants"]
+    finally:
+        db.close()
+    assert get_storage().local_path("live_thumb.jpg") is not None
+    assert list(get_storage().open("live_thumb.jpg")) == [b"variant"]
+
+
+def test_variants_of_deleted_documents_are_removed(client):
+    document_id, user_id = _document(is_deleted=True)
+    result = {"variants": [_saved_variant("deleted_thumb.jpg")], "placeholder": "LKO2"}
+    _store_variants(document_id, user_id, result)
+
+    db = SessionLocal()
+    try:
+        assert db.get(Document, document_id).variants is None
+    finally:
+        db.close()
+    assert not os.path.exists(get_storage().local_path("deleted_thumb.jpg"))
@@ -0,0 +1,79 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.core.database import SessionLocal
+from app.models import ChatMessage
+from app.services import chat_messages
+from app.services.chat_messages import CHAT_REPLY_JOB
+from app.services.jobs import (
+    DONE, FAILED, QUEUED, RUNNING, JobQueue, RedisJobQueue, _execute, _new_job, job_handler,
+)
+
+job_handler("test.double")(lambda payload: {"value": payload["n"] * 2})
+
+
+def _queue(server) -> RedisJobQueue:
+    queue = RedisJobQueue.__new__(RedisJobQueue)
+    queue._redis = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    return queue
+
+
+def test_jobs_held_by_a_dead_worker_are_recovered():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        queue = _queue(server)
+        # A worker without a heartbeat took two jobs and started one of them
+        started = await queue.submit("test.double", {"n": 1}, owner_id=1)
+        waiting = await queue.submit("test.double", {"n": 2}, owner_id=1)
+        for _ in range(2):
+            await queue._redis.lmove(queue.QUEUE_KEY, queue.PROCESSING_KEY.format("dead"), "RIGHT", "LEFT")
+        await queue._save(started["id"], {"status": RUNNING})
+        fresh = await queue.submit("test.double", {"n": 3}, owner_id=1)
+
+        workers = asyncio.create_task(_queue(server).run_workers(2))
+        try:
+            for _ in range(50):
+                jobs = [await queue.get(job["id"]) for job in (started, waiting, fresh)]
+                if all(job["status"] not in (QUEUED, RUNNING) for job in jobs):
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            workers.cancel()
+            await asyncio.gather(workers, return_exceptions=True)
+
+        assert [job["status"] for job in jobs] == [FAILED, DONE, DONE]
+        assert [job["result"] for job in jobs[1:]] == [{"value": 4}, {"value": 6}]
+        assert await queue._redis.keys(queue.PROCESSING_KEY.format("*")) == []
+
+    asyncio.run(scenario())
+
+
+def test_reply_to_a_chat_deleted_during_generation_fails(client, chat_id, monkeypatch):
+    chat = next(c for c in client.get("/api/chat/").json() if c["id"] == chat_id)
+
+    def generate_and_delete(prompt, context=None):
+        assert client.delete(f"/api/chat/{chat_id}").status_code == 204
+        return "too late"
+
+    monkeypatch.setattr(chat_messages, "generate_reply", generate_and_delete)
+    job = _new_job(CHAT_REPLY_JOB, {
+        "chat_id": chat_id, "client_id": chat["client_id"], "user_id": chat["user_id"], "content": "hello",
+    }, owner_id=chat["user_id"])
+
+    assert _execute(job) == {"status": FAILED, "error": "Chat deleted"}
+    db = SessionLocal()
+    try:
+        assert db.query(ChatMessage).filter(ChatMessage.user_chat_id == chat_id).count() == 0
+    finally:
+        db.close()
+
+
+def test_job_queue_backends_implement_the_interface():
+    class Incomplete(JobQueue):
+        async def submit(self, kind, payload, owner_id):
+            return {}
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,45 @@
+from app.services import list_versions
+
+
+def _etag_cycle(client, url):
+    first = client.get(url)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    return etag
+
+
+def test_write_invalidates_the_list(client, chat_id):
+    url = f"/api/chat/{chat_id}/messages"
+    etag = _etag_cycle(client, url)
+    client.post(url, json={"content": "hello"})
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [m["content"] for m in response.json()] == ["hello"]
+    assert response.headers["ETag"] != etag
+
+
+def test_bump_lost_to_a_redis_outage_is_retried(client, redis_outage, monkeypatch):
+    etag = _etag_cycle(client, "/api/chat/")
+
+    redis_outage.start()
+    client.post("/api/chat/", json={"title": "Created while Redis was down"})
+    assert list_versions._pending
+
+    # Redis is back with the old counter; the pending bump is applied before answering
+    redis_outage.end()
+
+    response = client.get("/api/chat/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert "Created while Redis was down" in [chat["title"] for chat in response.json()]
+    assert not list_versions._pending
+
+
+def test_bump_failure_while_redis_stays_down_gets_content_etags(client, redis_outage):
+    etag = _etag_cycle(client, "/api/documents/")
+    redis_outage.start()
+    list_versions.bump_list_version(1, "documents")
+    # No version to compare against: the body is hashed instead, never a 304 on the old version
+    response = client.get("/api/documents/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
@@ -0,0 +1,22 @@
+import logging
+import queue
+
+from app.core.log import DroppingQueueHandler, RateLimitFilter
+
+
+def _record(level, msg="value %s", args=("x",)):
+    return logging.LogRecord("test", level, __file__, 10, msg, args, None)
+
+
+def test_prepare_leaves_the_callers_record_alone():
+    handler = DroppingQueueHandler(queue.Queue())
+    record = _record(logging.INFO)
+    prepared = handler.prepare(record)
+    assert prepared.msg == "value x" and prepared.args is None
+    assert record.msg == "value %s" and record.args == ("x",)
+
+
+def test_warnings_are_limited_but_errors_are_not():
+    limiter = RateLimitFilter(burst=2, window=60)
+    assert [limiter.filter(_record(logging.WARNING)) for _ in range(4)] == [True, True, False, False]
+    assert all(limiter.filter(_record(logging.ERROR)) for _ in range(10))
@@ -0,0 +1,73 @@
+"""
+Endpoints declare a `@query_budget`; conftest turns on QUERY_BUDGET_STRICT, so
+a handler that runs more statements than its budget fails the request here.
+"""
+
+import pytest
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.profiling import QueryBudgetExceeded, assert_max_queries
+from app.models.user import User
+
+
+def test_strict_mode_is_on():
+    assert settings.QUERY_BUDGET_STRICT
+
+
+def test_send_message(client, chat_id):
+    response = client.post(f"/api/chat/{chat_id}/messages", json={"content": "hello"})
+    assert response.status_code == 200
+    # A second turn also builds context from the first
+    response = client.post(f"/api/chat/{chat_id}/messages", json={"content": "and again"})
+    assert response.status_code == 200
+
+
+def test_get_chat_messages(client, chat_id):
+    for content in ("one", "two", "three"):
+        client.post(f"/api/chat/{chat_id}/messages", json={"content": content})
+    response = client.get(f"/api/chat/{chat_id}/messages")
+    assert response.status_code == 200
+    assert [m["content"] for m in response.json()] == ["one", "two", "three"]
+
+
+def test_get_user_chats(client, chat_id):
+    client.post("/api/chat/", json={"title": "Another chat"})
+    response = client.get("/api/chat/")
+    assert response.status_code == 200
+    assert chat_id in [chat["id"] for chat in response.json()]
+
+
+def test_get_user_documents(client):
+    response = client.get("/api/documents/")
+    assert response.status_code == 200
+
+
+def test_admin_usage(client, chat_id):
+    client.post(f"/api/chat/{chat_id}/messages", json={"content": "hello"})
+    response = client.get("/api/admin/usage?group_by=day,client,user")
+    assert response.status_code == 200
+    assert "rows" in response.json()
+
+
+def test_assert_max_queries():
+    db = SessionLocal()
+    try:
+        with assert_max_queries(1):
+            db.execute(select(User.id)).all()
+        with pytest.raises(QueryBudgetExceeded):
+            with assert_max_queries(1):
+                db.execute(select(User.id)).all()
+                db.execute(select(User.email)).all()
+    finally:
+        db.close()
+
+
+def test_profile_detail(client, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", True)
+    response = client.get("/api/chat/", headers={"X-Profile": "1"})
+    profile_id = response.headers["X-Profile-Id"]
+    detail = client.get(f"/api/admin/profiles/{profile_id}").json()
+    assert detail["path"] == "/api/chat/"
+    assert detail["sql_count"] >= 1
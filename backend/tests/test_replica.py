@@ -0,0 +1,49 @@
+from sqlalchemy import create_engine, select
+
+from app.core import database
+from app.models.user import User
+
+
+def test_failed_replica_read_falls_back_to_primary(client, tmp_path, monkeypatch):
+    # An empty database stands in for a broken replica: every read fails
+    broken = create_engine(f"sqlite:///{tmp_path}/replica.db")
+    monkeypatch.setattr(database, "replica_engine", broken)
+    monkeypatch.setattr(database, "_replica_down_until", 0.0)
+
+    db = database.SessionLocal()
+    db.info["use_replica"] = True
+    try:
+        assert db.get_bind() is broken
+        emails = db.execute(select(User.email)).scalars().all()
+        assert "dev@alphalabs.com" in emails
+        # The rest of the request stays on the primary
+        assert db.get_bind() is database.engine
+    finally:
+        db.close()
+
+
+def test_replica_lists_get_content_etags(client, chat_id, tmp_path, monkeypatch):
+    # A copy of the primary is a replica that stops replaying from here on
+    source = database.engine.url.database
+    replica_file = tmp_path / "lagging.db"
+    replica_file.write_bytes(open(source, "rb").read())
+    monkeypatch.setattr(database, "replica_engine", create_engine(f"sqlite:///{replica_file}"))
+    monkeypatch.setattr(database, "_replica_down_until", 0.0)
+    monkeypatch.setattr(database, "has_recent_write", lambda user_id: False)
+
+    first = client.get("/api/chat/")
+    etag = first.headers["ETag"]
+    assert client.get("/api/chat/", headers={"If-None-Match": etag}).status_code == 304
+
+    # The primary moves on (and bumps the list version); the replica still
+    # serves the old list, which must not be cached under a new version
+    client.post("/api/chat/", json={"title": "Only on the primary"})
+    stale = client.get("/api/chat/", headers={"If-None-Match": etag})
+    assert stale.status_code == 304
+
+    # Once the replica catches up the ETag changes
+    replica_file.write_bytes(open(source, "rb").read())
+    fresh = client.get("/api/chat/", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert "Only on the primary" in [chat["title"] for chat in fresh.json()]
+    assert fresh.headers["ETag"] != etag
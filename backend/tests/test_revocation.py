@@ -0,0 +1,88 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.api.auth import generate_jwt_token, get_password_hash
+from app.core import cache
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import User
+from app.services import token_revocation
+from app.services.token_revocation import (
+    BLOOM_VERSION_KEY, _bit_offsets, _bloom, _bloom_days, _bloom_key, get_session, is_revoked,
+    record_session, refresh_revocation_filter, revoke_token,
+)
+
+
+def _user(email: str) -> User:
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == email).first()
+        if user is None:
+            user = User(email=email, name=email.split("@")[0], password=get_password_hash("secret"))
+            db.add(user)
+            db.commit()
+            db.refresh(user)
+        db.expunge(user)
+        return user
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def auth(monkeypatch):
+    """Real token checks; returns (headers, jti) for a fresh token of the dev user"""
+    monkeypatch.setattr(settings, "DISABLE_AUTH", False)
+    refresh_revocation_filter()
+    jti = str(uuid.uuid4())
+    token = generate_jwt_token(_user("dev@alphalabs.com"), jti=jti)
+    return {"Authorization": f"Bearer {token}"}, jti
+
+
+def test_revoked_token_is_401(client, auth):
+    headers, jti = auth
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+
+    assert revoke_token(jti, datetime.utcnow() + timedelta(hours=1))
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+
+
+def test_filter_miss_skips_redis(client, auth, monkeypatch):
+    headers, jti = auth
+    assert _bloom.bits is not None
+
+    lookups = []
+    monkeypatch.setattr(token_revocation, "get_redis", lambda: lookups.append(1) or cache.get_redis())
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+    assert not is_revoked(str(uuid.uuid4()))
+    assert lookups == []
+
+
+def test_day_buckets_expire(client):
+    jti = str(uuid.uuid4())
+    assert revoke_token(jti, datetime.utcnow() + timedelta(hours=1))
+    ttl = cache.get_redis().ttl(_bloom_key(datetime.utcnow()))
+    assert 0 < ttl <= (settings.JWT_TOKEN_LIFETIME_HOURS + 24) * 3600
+
+    # A bitmap from before the oldest still-valid token is not loaded
+    old_jti = str(uuid.uuid4())
+    old_day = _bloom_days()[-1] - timedelta(days=1)
+    redis = cache.get_redis()
+    for offset in _bit_offsets(old_jti):
+        redis.setbit(_bloom_key(old_day), offset, 1)
+    redis.incr(BLOOM_VERSION_KEY)
+    refresh_revocation_filter()
+    assert _bloom.might_contain(jti)
+    assert not _bloom.might_contain(old_jti)
+
+
+def test_revoking_another_users_session_is_404(client):
+    other = _user("other@alphalabs.com")
+    jti = str(uuid.uuid4())
+    now = datetime.utcnow()
+    record_session(other.id, jti, 1, now, now + timedelta(hours=1))
+
+    assert client.delete(f"/api/auth/sessions/{jti}").status_code == 404
+    assert get_session(other.id, jti) is not None
+    assert not is_revoked(jti)
@@ -0,0 +1,103 @@
+import io
+import time
+
+from app.services import sync
+from app.services.sync import decode_cursor, encode_cursor
+
+
+def _fresh_cursor(client):
+    response = client.get("/api/sync/")
+    assert response.status_code == 200
+    assert response.json()["full_resync"] is True
+    return response.json()["cursor"]
+
+
+def _sync(client, cursor, **params):
+    response = client.get("/api/sync/", params={"since": cursor, **params})
+    assert response.status_code == 200
+    body = response.json()
+    assert not body["full_resync"]
+    return body
+
+
+def test_pages_follow_the_cursor(client, chat_id):
+    cursor = _fresh_cursor(client)
+    for content in ("one", "two", "three"):
+        client.post(f"/api/chat/{chat_id}/messages", json={"content": content})
+
+    seen = []
+    pages = 0
+    while True:
+        body = _sync(client, cursor, limit=2)
+        seen += [message["content"] for message in body["messages"]]
+        cursor = body["cursor"]
+        pages += 1
+        if not body["has_more"]:
+            break
+    assert seen == ["one", "two", "three"]
+    assert pages == 2
+
+    # Caught up: the last cursor returns nothing new
+    body = _sync(client, cursor)
+    assert body["messages"] == [] and not body["has_more"]
+
+
+def test_deletes_come_back_as_tombstones(client):
+    chat = client.post("/api/chat/", json={"title": "Doomed"}).json()
+    client.post(f"/api/chat/{chat['id']}/messages", json={"content": "gone soon"})
+    document = client.post(
+        "/api/documents/upload",
+        files={"file": ("notes.txt", io.BytesIO(b"hello"), "text/plain")},
+    ).json()
+    cursor = _fresh_cursor(client)
+    messages = _sync(client, encode_cursor((0, 0)))["messages"]
+    message_id = next(m["id"] for m in messages if m["content"] == "gone soon")
+
+    assert client.delete(f"/api/chat/{chat['id']}").status_code == 204
+    assert client.delete(f"/api/documents/{document['id']}").status_code == 204
+
+    body = _sync(client, cursor)
+    assert chat["id"] in body["deleted"]["chats"]
+    assert document["id"] in body["deleted"]["documents"]
+    assert body["chats"] == [] and body["documents"] == []
+
+    # Replaying from the start: the message was upserted, then removed with its chat
+    body = _sync(client, encode_cursor((0, 0)), limit=1000)
+    assert message_id in body["deleted"]["messages"]
+    assert message_id not in [m["id"] for m in body["messages"]]
+
+
+def test_cursor_older_than_retention_needs_full_resync(client, monkeypatch):
+    cursor = _fresh_cursor(client)
+    position, issued = decode_cursor(cursor)
+    assert _sync(client, cursor)
+
+    expired = f"{position[0]}-{position[1]}-{issued - 31 * 86400}"
+    monkeypatch.setattr(sync.settings, "SYNC_RETENTION_DAYS", 30)
+    body = client.get("/api/sync/", params={"since": expired}).json()
+    assert body["full_resync"] is True
+    assert decode_cursor(body["cursor"])[1] >= int(time.time()) - 5
+
+
+def test_invalid_cursor_is_400(client):
+    assert client.get("/api/sync/", params={"since": "not-a-cursor"}).status_code == 400
+
+
+def test_held_horizon_warns_after_the_threshold(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sync.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(sync.settings, "SYNC_HORIZON_WARN_SECONDS", 60)
+    monkeypatch.setattr(sync, "_held_horizon", None)
+
+    # Nothing open: the horizon is the next txid and is never "stuck"
+    assert not sync._horizon_held_too_long(500, 500)
+    assert not sync._horizon_held_too_long(500, 510)
+    now[0] += 61
+    assert sync._horizon_held_too_long(500, 520)
+    # Logged once per threshold, not on every sync
+    now[0] += 1
+    assert not sync._horizon_held_too_long(500, 521)
+    now[0] += 60
+    assert sync._horizon_held_too_long(500, 530)
+    # The blocking transaction ended: the clock starts over
+    assert not sync._horizon_held_too_long(510, 530)
@@ -0,0 +1,86 @@
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+from app.api.auth import decode_token, generate_jwt_token
+from app.core import token_cache as token_cache_module
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.token_cache import VerifiedTokenCache, token_cache
+from app.models import User
+from app.services.token_revocation import refresh_revocation_filter, revoke_token
+
+
+def _dev_user() -> User:
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == "dev@alphalabs.com").one()
+        db.expunge(user)
+        return user
+    finally:
+        db.close()
+
+
+def test_entry_is_dropped_at_exp(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(token_cache_module.time, "time", lambda: now[0])
+    cache = VerifiedTokenCache(10)
+    cache.put("token", {"exp": 1060, "sub": "1"})
+
+    assert cache.get("token") == {"exp": 1060, "sub": "1"}
+    now[0] = 1060
+    assert cache.get("token") is None
+    # Gone for good, not just hidden
+    now[0] = 1000
+    assert cache.get("token") is None
+
+
+def test_lru_keeps_the_size_bound():
+    exp = time.time() + 3600
+    cache = VerifiedTokenCache(2)
+    cache.put("a", {"exp": exp})
+    cache.put("b", {"exp": exp})
+    cache.get("a")  # a is now the most recently used
+    cache.put("c", {"exp": exp})
+
+    assert len(cache._entries) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_tokens_without_exp_are_not_cached():
+    cache = VerifiedTokenCache(2)
+    cache.put("token", {"sub": "1"})
+    assert cache.get("token") is None
+
+
+def test_revoked_token_is_rejected_while_cached():
+    refresh_revocation_filter()
+    jti = str(uuid.uuid4())
+    token = generate_jwt_token(_dev_user(), jti=jti)
+    assert decode_token(token)["jti"] == jti
+    assert token_cache.get(token) is not None
+
+    assert revoke_token(jti, datetime.utcnow() + timedelta(hours=1))
+    assert token_cache.get(token) is not None
+    with pytest.raises(HTTPException) as error:
+        decode_token(token)
+    assert error.value.status_code == 401
+
+
+def test_compact_token_resolves_the_user_through_sub(client, monkeypatch):
+    monkeypatch.setattr(settings, "DISABLE_AUTH", False)
+    user = _dev_user()
+    token = generate_jwt_token(user, compact=True)
+    claims = jwt.get_unverified_claims(token)
+    assert "user" not in claims and claims["sub"] == str(user.id)
+
+    # Twice: once verified, once from the cache
+    for _ in range(2):
+        response = client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+        assert response.json()["id"] == user.id
@@ -0,0 +1,60 @@
+from datetime import datetime
+
+from sqlalchemy import delete
+
+from app.core.database import SessionLocal
+from app.models import ChatMessage, Client, Document, RollupWatermark, UsageDaily, User, UserChat
+from app.services.usage_rollups import roll_up_usage
+
+DAY = datetime(2020, 1, 1, 10, 0)
+
+
+def _seed():
+    db = SessionLocal()
+    try:
+        # Start from an empty rollup so the first run backfills from DAY
+        db.execute(delete(UsageDaily))
+        db.execute(delete(RollupWatermark))
+        user = db.query(User).filter(User.email == "dev@alphalabs.com").one()
+        client = Client(name="Usage test")
+        db.add(client)
+        db.flush()
+        chat = UserChat(user_id=user.id, client_id=client.id, title="Usage")
+        db.add(chat)
+        db.flush()
+        for is_voice in (0, 1, 1, 0, 0):
+            db.add(ChatMessage(
+                user_chat_id=chat.id, user_id=user.id, client_id=client.id,
+                prompt="q", response="a", is_voice=is_voice, created_on=DAY,
+            ))
+        for size in (100, 250):
+            db.add(Document(
+                client_id=client.id, original_filename="a.txt", file_path=f"usage-{size}",
+                file_size=size, uploaded_by=user.id, created_on=DAY,
+            ))
+        db.commit()
+        return client.id, user.id
+    finally:
+        db.close()
+
+
+def test_rollup_counts_each_row_once(client):
+    client_id, user_id = _seed()
+
+    assert roll_up_usage() == 1
+    # The next window starts where the first ended; nothing is added twice
+    assert roll_up_usage() == 0
+
+    response = client.get("/api/admin/usage", params={
+        "start": "2020-01-01", "end": "2020-01-01", "client_id": client_id, "group_by": "day,user",
+    })
+    assert response.status_code == 200
+    assert response.json()["rows"] == [{
+        "day": "2020-01-01",
+        "user_id": user_id,
+        "messages": 5,
+        "voice_messages": 2,
+        "text_messages": 3,
+        "documents": 2,
+        "document_bytes": 350,
+    }]
@@ -0,0 +1,145 @@
+import json
+import sys
+from types import SimpleNamespace
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app.core.config import settings
+from app.services import transcription
+from app.services.transcription import Transcriber, TranscriberUnavailable, create_transcriber
+
+
+def test_partials_and_final_transcript(client, chat_id):
+    with client.websocket_connect(f"/api/chat/{chat_id}/voice") as ws:
+        ws.send_bytes(b"what is ")
+        assert ws.receive_json() == {"type": "partial", "text": "what is"}
+        # A multi-byte character split across chunks
+        ws.send_bytes("alpha caf".encode() + "é".encode()[:1])
+        assert ws.receive_json() == {"type": "partial", "text": "what is alpha caf"}
+        ws.send_bytes("é".encode()[1:])
+        assert ws.receive_json() == {"type": "partial", "text": "what is alpha café"}
+
+        ws.send_text(json.dumps({"type": "end"}))
+        assert ws.receive_json() == {"type": "final", "text": "what is alpha café"}
+        job = ws.receive_json()
+        assert job["type"] == "job" and job["chat_id"] == chat_id
+        result = ws.receive_json()
+        assert result["type"] == "result"
+        assert result["job_id"] == job["job_id"]
+        assert result["status"] == "done"
+        assert result["result"]["content"] == "what is alpha café"
+        assert result["result"]["is_voice"] is True
+
+    messages = client.get(f"/api/chat/{chat_id}/messages").json()
+    assert [(m["content"], m["is_voice"]) for m in messages] == [("what is alpha café", True)]
+
+
+def test_recording_over_max_bytes_is_refused(client, chat_id, monkeypatch):
+    monkeypatch.setattr(settings, "VOICE_MAX_BYTES", 16)
+    with client.websocket_connect(f"/api/chat/{chat_id}/voice") as ws:
+        ws.send_bytes(b"x" * 10)
+        assert ws.receive_json()["type"] == "partial"
+        ws.send_bytes(b"x" * 10)
+        assert ws.receive_json() == {"type": "error", "detail": "Recording too large"}
+        assert ws.receive() == {"type": "websocket.close", "code": 1009, "reason": ""}
+
+
+def test_idle_recording_times_out(client, chat_id, monkeypatch):
+    monkeypatch.setattr(settings, "VOICE_IDLE_TIMEOUT_SECONDS", 0.1)
+    with client.websocket_connect(f"/api/chat/{chat_id}/voice") as ws:
+        assert ws.receive_json() == {"type": "error", "detail": "Recording timed out"}
+        assert ws.receive()["code"] == 1008
+
+
+def test_cancel_sends_nothing(client, chat_id):
+    with client.websocket_connect(f"/api/chat/{chat_id}/voice") as ws:
+        ws.send_bytes(b"never mind")
+        assert ws.receive_json()["type"] == "partial"
+        ws.send_text(json.dumps({"type": "cancel"}))
+        assert ws.receive()["type"] == "websocket.close"
+    assert client.get(f"/api/chat/{chat_id}/messages").json() == []
+
+
+def test_empty_recording_is_not_submitted(client, chat_id):
+    with client.websocket_connect(f"/api/chat/{chat_id}/voice") as ws:
+        ws.send_text(json.dumps({"type": "end"}))
+        assert ws.receive_json() == {"type": "final", "text": ""}
+        assert ws.receive_json() == {"type": "error", "detail": "No speech recognised"}
+    assert client.get(f"/api/chat/{chat_id}/messages").json() == []
+
+
+def test_unknown_chat_is_rejected(client):
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect("/api/chat/999999/voice") as ws:
+            ws.receive_json()
+    assert exc.value.code == 1008
+
+
+def test_refused_without_a_configured_transcriber(client, chat_id, monkeypatch):
+    monkeypatch.setattr(settings, "TRANSCRIBER_BACKEND", None)
+    with client.websocket_connect(f"/api/chat/{chat_id}/voice") as ws:
+        assert ws.receive_json() == {"type": "error", "detail": "Voice messages are not available"}
+        assert ws.receive()["code"] == 1011
+
+
+def test_stub_transcriber_is_test_only(monkeypatch):
+    monkeypatch.setattr(settings, "ENVIRONMENT", "production")
+    with pytest.raises(TranscriberUnavailable):
+        create_transcriber("stub")
+
+
+def test_transcriber_must_implement_feed_and_finish():
+    class Partial(Transcriber):
+        def feed(self, chunk):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_vosk_backend_needs_the_package_and_a_model(monkeypatch):
+    monkeypatch.setitem(sys.modules, "vosk", None)
+    with pytest.raises(TranscriberUnavailable):
+        create_transcriber("vosk")
+
+
+class _FakeRecognizer:
+    """Stands in for vosk.KaldiRecognizer: each byte is one "word" of audio, b"." a pause"""
+
+    def __init__(self, model, sample_rate):
+        self.words = []
+
+    def AcceptWaveform(self, data):
+        assert len(data) % 2 == 0
+        self.words += [chr(b) for b in data if b != ord(".")]
+        return b"." in data
+
+    def _take(self):
+        text, self.words = "".join(self.words), []
+        return json.dumps({"text": text})
+
+    def Result(self):
+        return self._take()
+
+    def PartialResult(self):
+        return json.dumps({"partial": "".join(self.words)})
+
+    def FinalResult(self):
+        return self._take()
+
+
+def test_vosk_transcript_joins_utterances(monkeypatch):
+    monkeypatch.setitem(sys.modules, "vosk", SimpleNamespace(
+        SetLogLevel=lambda level: None, Model=lambda path: object(), KaldiRecognizer=_FakeRecognizer,
+    ))
+    monkeypatch.setattr(transcription, "_vosk_model", None)
+    monkeypatch.setattr(settings, "VOSK_MODEL_PATH", "/models/vosk")
+
+    transcriber = create_transcriber("vosk")
+    # An odd byte waits for the rest of its sample
+    assert transcriber.feed(b"abc") == "ab"
+    assert transcriber.feed(b"d..") == "abcd"
+    assert transcriber.feed(b"") is None
+    assert transcriber.feed(b"ef") == "abcd ef"
+    assert transcriber.finish() == "abcd ef"
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Chat job worker for JOB_QUEUE_BACKEND=redis.
+
+Runs JOB_WORKERS consumers that pull jobs from Redis, generate replies and
+store the results. Start as many worker processes as needed:
+
+    python worker.py
+"""
+
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.core import background
+from app.core.log import setup_logging
+from app.services.chat_activity import flush_chat_activity
+from app.services.jobs import RedisJobQueue
+from app.services.list_versions import retry_list_version_bumps
+import app.services.chat_messages  # noqa: F401 - registers the chat job handlers
+
+setup_logging()
+logger = logging.getLogger("alphalabs.worker")
+
+async def main():
+    queue = RedisJobQueue()
+    logger.info(f"Starting {settings.JOB_WORKERS} chat job workers")
+    # Replies recorded here buffer chat activity in this process, same as the API
+    background.start_periodic("chat-activity", settings.CHAT_ACTIVITY_FLUSH_SECONDS, flush_chat_activity)
+    background.start_periodic("list-versions", settings.REDIS_RETRY_SECONDS, retry_list_version_bumps)
+    try:
+        await queue.run_workers(settings.JOB_WORKERS)
+    finally:
+        await background.stop_all()
+        try:
+            flush_chat_activity()
+        except Exception as e:
+            logger.warning(f"Could not flush chat activity: {e}")
+        await queue.stop()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -56,6 +56,9 @@ export const VoiceInput: React.FC<VoiceInputProps> = ({
       const audioUri = await voiceUtils.stopRecording();
       
       // TODO: Implement voice-to-text conversion
+      // The backend transcribes while recording over WS /api/chat/{chatId}/voice
+      // (raw 16 kHz PCM frames in, partial transcripts out); using it needs a
+      // recorder that exposes audio chunks, which expo-av does not.
       // For now, we'll simulate it with a placeholder
       const transcribedText = "Voice input detected - transcription service needed";
       